@@ -1,47 +1,161 @@
 import * as THREE from "https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.module.js";
 import { scene, camera } from "./scene.js";
-import { setPoints } from "./ui.js";
+import { setPoints, setPickGrid, setSearchIndex } from "./ui.js";
 
 export let points = null;
 export const artistList = [];
 export const artistPositions = new Map();
-export const artistBios = new Map();
-export const artistLinks = new Map();
-export const artistTags = new Map();
+export const artistDetails = new Map();
+
+// Stars are appended to the points buffer as they arrive, so buffer slots
+// and artist ids (index in names.json) differ once levels of detail are used.
+export let slotIds = null;
+export let starPositions = null;
+export let starLoaded = null;
+const artistIds = new Map();
+let loadedCount = 0;
 
 export let core = null;
 export let coreGlow = null;
 export const core_base_opacity = 0.8;
 export const core_glow_base_opacity = 0.2;
 
-const SCALE = 12;
+export const SCALE = 12;
 
 const textureLoader = new THREE.TextureLoader();
 const starTexture = textureLoader.load("./textures/star.png");
 
-export function createGalaxy(data) {
-  const count = Object.keys(data).length;
-  const positions = new Float32Array(count * 3);
+let manifest = null;
+const shardRequests = new Map();
+
+const LOD_RANGE = 1.5;
+const LOD_MAX_PENDING = 4;
+const LOD_CHECK_INTERVAL = 250;
+const lodRequests = new Map();
+let lodCells = null;
+let lodPending = 0;
+let lastLODCheck = 0;
+
+// Same hash as fnv1a_32 in src/app/utils/galaxy.py.
+function fnv1a32(text) {
+  let h = 0x811c9dc5;
+  for (const byte of new TextEncoder().encode(text)) {
+    h ^= byte;
+    h = Math.imul(h, 0x01000193) >>> 0;
+  }
+  return h >>> 0;
+}
+
+export async function loadGalaxy() {
+  const res = await fetch("./data/galaxy/manifest.json");
+
+  if (!res.ok) {
+    const data = await fetch("./data/artist_galaxy.json").then(r => r.json());
+    createGalaxyFromJSON(data);
+    return;
+  }
+
+  manifest = await res.json();
+
+  if (manifest.lod) {
+    await loadLODGalaxy();
+  } else {
+    const [names, buffer] = await Promise.all([
+      fetch(`./data/galaxy/${manifest.names}`).then(r => r.json()),
+      fetch(`./data/galaxy/${manifest.positions}`).then(r => r.arrayBuffer()),
+    ]);
+
+    createGalaxy(names, new Float32Array(buffer));
+  }
+
+  if (manifest.grid) {
+    fetch(`./data/galaxy/${manifest.grid}`)
+      .then(r => r.json())
+      .then(setPickGrid)
+      .catch(err => console.error(err));
+  }
+
+  if (manifest.search) {
+    fetch(`./data/galaxy/${manifest.search}`)
+      .then(r => r.json())
+      .then(setSearchIndex)
+      .catch(err => console.error(err));
+  }
+}
+
+function createGalaxyFromJSON(data) {
+  const names = Object.keys(data);
+  const raw = new Float32Array(names.length * 3);
+
+  names.forEach((artist, i) => {
+    const info = data[artist];
+    raw.set(info.positions, i * 3);
+    artistDetails.set(artist.trim().toLowerCase(), { bio: info.bio, links: info.links, tags: info.tags });
+  });
+
+  createGalaxy(names, raw);
+}
+
+export function getArtistDetails(name) {
+  const key = name.trim().toLowerCase();
+  if (artistDetails.has(key) || !manifest) {
+    return Promise.resolve(artistDetails.get(key));
+  }
+
+  const shard = fnv1a32(name) % manifest.shards;
+  if (!shardRequests.has(shard)) {
+    const file = manifest.details.replace("{shard}", String(shard).padStart(3, "0"));
+    shardRequests.set(shard, fetch(`./data/galaxy/${file}`)
+      .then(res => res.json())
+      .then(details => {
+        Object.entries(details).forEach(([artist, info]) => {
+          artistDetails.set(artist.trim().toLowerCase(), info);
+        });
+      })
+      .catch(err => {
+        shardRequests.delete(shard);
+        console.error(err);
+      }));
+  }
+
+  return shardRequests.get(shard).then(() => artistDetails.get(key));
+}
+
+export function createGalaxy(names, raw) {
+  initStars(names);
+  addStars(Int32Array.from(names.keys()), raw);
+  createDecorations(points.geometry.attributes.position.array, loadedCount);
+}
+
+async function loadLODGalaxy() {
+  // The most important stars (tier 0) are shown first, finer tiers are
+  // streamed in by octree cell from updateLOD() as the camera moves.
+  const names = await fetch(`./data/galaxy/${manifest.names}`).then(r => r.json());
+  initStars(names);
+
+  const tier0 = manifest.lod.files.flatMap((entry, f) => entry.tier === 0 ? [f] : []);
+  await Promise.all(tier0.map(loadLODFile));
 
-  let idx = 0;
-  Object.entries(data).forEach(([artist, info]) => {
-    const key = artist.trim().toLowerCase();
-    const [x, z, y] = info.positions;
+  createDecorations(points.geometry.attributes.position.array, loadedCount);
+}
 
-    positions[idx * 3 + 0] = x * SCALE;
-    positions[idx * 3 + 1] = y * SCALE;
-    positions[idx * 3 + 2] = z * SCALE;
+function initStars(names) {
+  const count = names.length;
+  slotIds = new Int32Array(count);
+  starPositions = new Float32Array(count * 3);
+  starLoaded = new Uint8Array(count);
+  loadedCount = 0;
 
-    artistPositions.set(key, new THREE.Vector3(x * SCALE, y * SCALE, z * SCALE));
-    artistBios.set(key, info.bio);
-    artistLinks.set(key, info.links);
-    artistTags.set(key, info.tags);
+  names.forEach((artist, id) => {
     artistList.push(artist.trim());
-    idx++;
+    artistIds.set(artist.trim().toLowerCase(), id);
   });
 
   const geometry = new THREE.BufferGeometry();
-  geometry.setAttribute("position", new THREE.BufferAttribute(positions, 3));
+  const attribute = new THREE.BufferAttribute(new Float32Array(count * 3), 3);
+  attribute.setUsage(THREE.DynamicDrawUsage);
+  geometry.setAttribute("position", attribute);
+  geometry.setDrawRange(0, 0);
 
   const material = new THREE.PointsMaterial({
       size: 0.2,
@@ -57,7 +171,123 @@ export function createGalaxy(data) {
   scene.add(points);
 
   setPoints(points);
+}
+
+// Appends stars to the points buffer. raw holds the exported positions of
+// ids, in (x, z, y) order.
+function addStars(ids, raw) {
+  const attribute = points.geometry.attributes.position;
+  const positions = attribute.array;
+  const first = loadedCount;
+
+  ids.forEach((id, i) => {
+    if (starLoaded[id]) return;
+
+    const x = raw[i * 3 + 0] * SCALE;
+    const z = raw[i * 3 + 1] * SCALE;
+    const y = raw[i * 3 + 2] * SCALE;
+
+    positions.set([x, y, z], loadedCount * 3);
+    starPositions.set([x, y, z], id * 3);
+    slotIds[loadedCount] = id;
+    starLoaded[id] = 1;
+    loadedCount++;
+
+    artistPositions.set(artistList[id].toLowerCase(), new THREE.Vector3(x, y, z));
+  });
+
+  if (loadedCount === first) return;
+
+  attribute.addUpdateRange(first * 3, (loadedCount - first) * 3);
+  attribute.needsUpdate = true;
+  points.geometry.setDrawRange(0, loadedCount);
+  points.geometry.computeBoundingSphere();
+}
+
+function loadLODFile(f) {
+  if (!lodRequests.has(f)) {
+    const entry = manifest.lod.files[f];
+    lodPending++;
+    lodRequests.set(f, fetch(`./data/galaxy/${manifest.lod.dir}/${entry.file}`)
+      .then(res => res.arrayBuffer())
+      .then(buffer => {
+        addStars(new Int32Array(buffer, 0, entry.count), new Float32Array(buffer, entry.count * 4, entry.count * 3));
+      })
+      .catch(err => {
+        lodRequests.delete(f);
+        console.error(err);
+      })
+      .finally(() => {
+        lodPending--;
+      }));
+  }
+  return lodRequests.get(f);
+}
+
+// Distance from the camera to a cell, cell bounds are in export coordinates.
+function distanceToCell(entry) {
+  const p = camera.position;
+  const local = [p.x / SCALE, p.z / SCALE, p.y / SCALE];
+  let sq = 0;
+  for (let a = 0; a < 3; a++) {
+    const d = Math.max(entry.min[a] - local[a], 0, local[a] - entry.max[a]);
+    sq += d * d;
+  }
+  return Math.sqrt(sq) * SCALE;
+}
+
+// Called every frame: loads the finer cells the camera is close to. A cell
+// is loaded within LOD_RANGE times its own diagonal.
+export function updateLOD() {
+  if (!manifest || !manifest.lod || !points) return;
+
+  const now = performance.now();
+  if (now - lastLODCheck < LOD_CHECK_INTERVAL) return;
+  lastLODCheck = now;
+
+  const candidates = [];
+  manifest.lod.files.forEach((entry, f) => {
+    if (entry.tier === 0 || lodRequests.has(f)) return;
+
+    const diagonal = Math.hypot(...entry.max.map((v, a) => v - entry.min[a])) * SCALE;
+    const dist = distanceToCell(entry);
+    if (dist < LOD_RANGE * diagonal) candidates.push({ f, dist });
+  });
+
+  candidates.sort((a, b) => a.dist - b.dist);
+  for (const { f } of candidates) {
+    if (lodPending >= LOD_MAX_PENDING) break;
+    loadLODFile(f);
+  }
+}
+
+// Resolves with the position of an artist, loading its level-of-detail cell
+// first when needed.
+export async function locateArtist(name) {
+  const key = name.trim().toLowerCase();
+  if (artistPositions.has(key) || !manifest || !manifest.lod) {
+    return artistPositions.get(key);
+  }
+
+  const id = artistIds.get(key);
+  if (id === undefined) return undefined;
+
+  if (!lodCells) {
+    lodCells = fetch(`./data/galaxy/${manifest.lod.dir}/${manifest.lod.cells}`)
+      .then(res => res.arrayBuffer())
+      .then(buffer => new Uint32Array(buffer))
+      .catch(err => {
+        lodCells = null;
+        throw err;
+      });
+  }
+
+  const cells = await lodCells;
+  await loadLODFile(cells[id]);
+  return artistPositions.get(key);
+}
 
+function createDecorations(positions, count) {
   const bloomPositions = [];
   const bloom_ratio = 0.04;
 
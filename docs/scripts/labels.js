@@ -1,6 +1,6 @@
 import * as THREE from "https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.module.js";
 import { scene, camera } from "./scene.js";
-import { points, artistList } from "./galaxy.js";
+import { points, artistList, slotIds } from "./galaxy.js";
 
 const LABEL_DISTANCE = 3;
 const MAX_LABELS = 100;
@@ -81,14 +81,15 @@ export function updateLabels() {
   if (!points) return;
 
   const positions = points.geometry.attributes.position.array;
+  const count = Math.min(points.geometry.drawRange.count, positions.length / 3);
   camPos.copy(camera.position);
 
   const nearby = [];
-  for (let i = 0; i < positions.length; i += 3) {
+  for (let i = 0; i < count * 3; i += 3) {
     tmpVec3.set(positions[i], positions[i + 1], positions[i + 2]);
     const dist = camPos.distanceTo(tmpVec3);
     if (dist < LABEL_DISTANCE) {
-      nearby.push({ name: artistList[i / 3], pos: tmpVec3.clone(), dist });
+      nearby.push({ name: artistList[slotIds[i / 3]], pos: tmpVec3.clone(), dist });
     }
   }
 
@@ -1,23 +1,21 @@
 import { initScene, scene, renderer, camera, controls } from "./scene.js";
-import { createGalaxy, updateCoreVisibility } from "./galaxy.js";
+import { loadGalaxy, updateCoreVisibility, updateLOD } from "./galaxy.js";
 import { initUI } from "./ui.js";
-import { initEmbeddings } from "./embeddings.js";
+import { initNeighbours } from "./neighbours.js";
 import { updateLabels } from "./labels.js";
 import "./sidebar.js";
 
 initScene();
 initUI();
-initEmbeddings();
+initNeighbours();
 
-fetch("./data/artist_galaxy.json")
-  .then(res => res.json())
-  .then(data => createGalaxy(data))
-  .catch(err => console.error(err));
+loadGalaxy().catch(err => console.error(err));
 
 function animate() {
   requestAnimationFrame(animate);
   controls.update();
   updateCoreVisibility();
+  updateLOD();
   renderer.render(scene, camera);
   updateLabels();
 }
@@ -0,0 +1,17 @@
+export let neighbours = new Map();
+
+export function initNeighbours() {
+  fetch("./data/artist_neighbours.json")
+    .then(res => res.json())
+    .then(data => {
+      const k = data.k;
+      data.names.forEach((artist, i) => {
+        const similar = [];
+        for (let j = i * k; j < (i + 1) * k; j++) {
+          similar.push({ artistName: data.names[data.neighbours[j]], score: data.scores[j] / 1000 });
+        }
+        neighbours.set(artist, similar);
+      });
+    })
+    .catch(err => console.error(err));
+}
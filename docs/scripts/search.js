@@ -0,0 +1,107 @@
+// Artist name search over the index exported by SearchIndex
+// (src/app/utils/search.py), with the same results as search_ranks there.
+// All postings hold ranks (artist ids ordered by degree) in ascending order,
+// the trigram postings are delta encoded.
+
+// Same bound as MAX_FUZZY_CANDIDATES in src/app/utils/search.py.
+const MAX_FUZZY_CANDIDATES = 1000;
+
+// names: the artist names by id, e.g. artistList of galaxy.js.
+export function loadSearchIndex(data, names) {
+  const trigrams = new Map();
+  for (const [gram, deltas] of Object.entries(data.trigrams)) {
+    const ranks = new Int32Array(deltas.length);
+    let rank = 0;
+    deltas.forEach((delta, i) => {
+      rank += delta;
+      ranks[i] = rank;
+    });
+    trigrams.set(gram, ranks);
+  }
+
+  return {
+    names,
+    prefixLength: data.prefix_length,
+    limit: data.limit,
+    order: data.order,
+    prefixes: new Map(Object.entries(data.prefixes)),
+    trigrams,
+    keys: new Map(),
+  };
+}
+
+// Same steps as normalize_query in src/app/utils/search.py.
+export function normalizeQuery(text) {
+  return text
+    .normalize("NFKD")
+    .replace(/\p{M}/gu, "")
+    .toLowerCase()
+    .replace(/[^\p{L}\p{N}]+/gu, " ")
+    .trim();
+}
+
+function rankKey(index, rank) {
+  const id = index.order[rank];
+  if (!index.keys.has(id)) index.keys.set(id, normalizeQuery(index.names[id]));
+  return index.keys.get(id);
+}
+
+function includesRank(ranks, rank) {
+  let lo = 0;
+  let hi = ranks.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (ranks[mid] < rank) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo < ranks.length && ranks[lo] === rank;
+}
+
+// Short queries are one lookup in the prefix table, which holds at most
+// index.limit artists per prefix. Longer ones walk the shortest trigram list,
+// keep the ranks found in all other lists and check the full substring;
+// artists sharing two thirds of the trigrams fill up the results when there
+// are not enough exact hits. That fill-up is approximate: only the best
+// ranked MAX_FUZZY_CANDIDATES artists of the rarest lists are counted.
+export function searchArtists(index, text, limit = index.limit) {
+  const query = normalizeQuery(text);
+  const chars = Array.from(query);
+  if (!chars.length) return [];
+
+  let ranks = [];
+  if (chars.length <= index.prefixLength) {
+    ranks = (index.prefixes.get(query) || []).slice(0, limit);
+  } else {
+    const grams = new Set();
+    for (let i = 0; i + 3 <= chars.length; i++) grams.add(chars.slice(i, i + 3).join(""));
+    const lists = [...grams]
+      .map(gram => index.trigrams.get(gram) || new Int32Array(0))
+      .sort((a, b) => a.length - b.length);
+
+    for (const rank of lists[0]) {
+      if (lists.every((ranks, l) => l === 0 || includesRank(ranks, rank)) && rankKey(index, rank).includes(query)) {
+        ranks.push(rank);
+        if (ranks.length === limit) break;
+      }
+    }
+
+    if (ranks.length < limit) {
+      const needed = Math.ceil((2 * grams.size) / 3);
+      const candidates = new Set();
+      for (const list of lists.slice(0, lists.length - needed + 1)) {
+        for (const rank of list.subarray(0, MAX_FUZZY_CANDIDATES)) candidates.add(rank);
+      }
+      const found = new Set(ranks);
+      const fuzzy = [...candidates]
+        .sort((a, b) => a - b)
+        .slice(0, MAX_FUZZY_CANDIDATES)
+        .filter(rank => !found.has(rank))
+        .map(rank => [rank, lists.filter(list => includesRank(list, rank)).length])
+        .filter(([, n]) => n >= needed)
+        .sort((a, b) => b[1] - a[1] || a[0] - b[0]);
+      ranks.push(...fuzzy.slice(0, limit - ranks.length).map(([rank]) => rank));
+    }
+  }
+
+  return ranks.map(rank => index.names[index.order[rank]]);
+}
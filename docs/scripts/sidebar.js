@@ -1,32 +1,30 @@
-import { embeddings, cosineSimilarity } from "./embeddings.js";
+import { neighbours } from "./neighbours.js";
 import { focusArtist } from "./ui.js";
 import { drawSimilarityLines } from "./similarlines.js";
-import { artistBios, artistLinks, artistTags } from "./galaxy.js";
+import { getArtistDetails } from "./galaxy.js";
 
 const sidebar = document.querySelector(".sidebar");
 
+let currentArtist = null;
+
 export function showSidebar(name) {
-  const artistEmbedding = embeddings.get(name);
-  const key = name.trim().toLowerCase();
-  const bio = artistBios.get(key);
-  const links = artistLinks.get(key);
-  const tags = artistTags.get(key);
+  currentArtist = name;
+  getArtistDetails(name).then(details => {
+    // Ignore details that arrive after another artist was selected.
+    if (currentArtist !== name) return;
+    renderSidebar(name, details || {});
+  });
+}
+
+function renderSidebar(name, { bio, links, tags }) {
+  const top10 = neighbours.get(name);
 
-  if (!artistEmbedding) {
+  if (!top10) {
     sidebar.innerHTML = `<h2>${name}</h2>`;
     sidebar.style.display = "block";
     return;
   }
 
-  const scores = [];
-  embeddings.forEach((embed, artistName) => {
-    if (artistName === name) return;
-    scores.push({ artistName, score: cosineSimilarity(artistEmbedding, embed) });
-  });
-
-  scores.sort((a, b) => b.score - a.score);
-  const top10 = scores.slice(0, 10);
-
   drawSimilarityLines(name, top10);
 
   const bioHTML = bio
@@ -1,10 +1,12 @@
 import * as THREE from "https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.module.js";
 import { scene } from "./scene.js";
-import { artistPositions } from "./galaxy.js";
+import { locateArtist } from "./galaxy.js";
 
 let lines = null;
+let linesRequest = 0;
 
 export function clearSimilarityLines() {
+  linesRequest++;
   if (lines) {
     scene.remove(lines);
     lines.geometry.dispose();
@@ -13,16 +15,19 @@ export function clearSimilarityLines() {
   }
 }
 
-export function drawSimilarityLines(centerArtist, similarArtists) {
+export async function drawSimilarityLines(centerArtist, similarArtists) {
   clearSimilarityLines();
+  const request = linesRequest;
 
-  const centerPos = artistPositions.get(centerArtist.toLowerCase());
-  if (!centerPos) return;
+  // Artists outside the loaded levels of detail are located first.
+  const [centerPos, ...targets] = await Promise.all(
+    [centerArtist, ...similarArtists.map(({ artistName }) => artistName)].map(locateArtist)
+  );
+  if (request !== linesRequest || !centerPos) return;
 
   const positions = [];
 
-  similarArtists.forEach(({ artistName }) => {
-    const targetPos = artistPositions.get(artistName.toLowerCase());
+  targets.forEach(targetPos => {
     if (!targetPos) return;
 
     positions.push(
@@ -1,16 +1,108 @@
 import * as THREE from "https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.module.js";
 import gsap from "https://cdn.jsdelivr.net/npm/gsap@3.12.2/index.js";
 import { scene, camera, controls } from "./scene.js";
-import { artistList, artistPositions } from "./galaxy.js";
+import { artistList, locateArtist, slotIds, starPositions, starLoaded, SCALE } from "./galaxy.js";
 import { showSidebar } from "./sidebar.js";
 import { clearSimilarityLines } from "./similarlines.js";
+import { loadSearchIndex, searchArtists } from "./search.js";
 
 let points;
+let pickGrid = null;
+let searchIndex = null;
 
 export function setPoints(p) {
   points = p;
 }
 
+// Sparse grid exported by SpatialIndex.export_grid (src/app/utils/spatial.py),
+// in the unscaled export coordinates (x, y, z) = world (x, z, y) / SCALE.
+export function setPickGrid(grid) {
+  grid.cellIndex = new Map(grid.cells.map((cell, c) => [cell, c]));
+  pickGrid = grid;
+}
+
+// Name search index exported by SearchIndex (src/app/utils/search.py).
+export function setSearchIndex(data) {
+  searchIndex = loadSearchIndex(data, artistList);
+}
+
+const candidate = new THREE.Vector3();
+
+// Walks the grid cells along the ray and only tests the stars in and around
+// them, instead of every star like the raycaster. Returns the artist id of
+// the loaded star closest to the camera within threshold of the ray, or -1.
+function pickFromGrid(ray, threshold) {
+  const { origin, cell_size: cellSize, dims, offsets, ids, cellIndex } = pickGrid;
+  const o = [ray.origin.x / SCALE, ray.origin.z / SCALE, ray.origin.y / SCALE];
+  const d = [ray.direction.x, ray.direction.z, ray.direction.y];
+  const radius = threshold / SCALE;
+
+  // Part of the ray inside the grid, widened by the threshold.
+  let tMin = 0;
+  let tMax = Infinity;
+  for (let a = 0; a < 3; a++) {
+    const lo = origin[a] - radius;
+    const hi = origin[a] + dims[a] * cellSize + radius;
+    if (Math.abs(d[a]) < 1e-12) {
+      if (o[a] < lo || o[a] > hi) return -1;
+      continue;
+    }
+    const t0 = (lo - o[a]) / d[a];
+    const t1 = (hi - o[a]) / d[a];
+    tMin = Math.max(tMin, Math.min(t0, t1));
+    tMax = Math.min(tMax, Math.max(t0, t1));
+  }
+  if (tMin > tMax) return -1;
+
+  const reach = Math.ceil(radius / cellSize);
+  const visited = new Set();
+  const maxDistSq = threshold * threshold;
+  let best = -1;
+  let bestT = Infinity;
+
+  for (let t = tMin; t <= tMax + cellSize; t += cellSize / 2) {
+    // Cells further along the ray cannot hold a closer hit.
+    if (t - (reach + 1) * cellSize > bestT) break;
+
+    const cx = Math.floor((o[0] + d[0] * t - origin[0]) / cellSize);
+    const cy = Math.floor((o[1] + d[1] * t - origin[1]) / cellSize);
+    const cz = Math.floor((o[2] + d[2] * t - origin[2]) / cellSize);
+
+    for (let x = cx - reach; x <= cx + reach; x++) {
+      if (x < 0 || x >= dims[0]) continue;
+      for (let y = cy - reach; y <= cy + reach; y++) {
+        if (y < 0 || y >= dims[1]) continue;
+        for (let z = cz - reach; z <= cz + reach; z++) {
+          if (z < 0 || z >= dims[2]) continue;
+
+          const cell = x + dims[0] * (y + dims[1] * z);
+          if (visited.has(cell)) continue;
+          visited.add(cell);
+
+          const c = cellIndex.get(cell);
+          if (c === undefined) continue;
+
+          for (let k = offsets[c]; k < offsets[c + 1]; k++) {
+            const idx = ids[k];
+            if (!starLoaded[idx]) continue;
+
+            candidate.fromArray(starPositions, idx * 3);
+            if (ray.distanceSqToPoint(candidate) > maxDistSq) continue;
+
+            const hitT = candidate.sub(ray.origin).dot(ray.direction) / SCALE;
+            if (hitT >= 0 && hitT < bestT) {
+              bestT = hitT;
+              best = idx;
+            }
+          }
+        }
+      }
+    }
+  }
+
+  return best;
+}
+
 const input = document.getElementById("artistSearch");
 const clearBtn = document.getElementById("clearSearch");
 const dropdown = document.getElementById("dropdown");
@@ -50,11 +142,12 @@ function flyTo(targetPos, zoomIn = true) {
 }
 
 export function focusArtist(name) {
-  const pos = artistPositions.get(name.toLowerCase());
-  if (!pos) return;
+  locateArtist(name).then(pos => {
+    if (!pos) return;
 
-  flyTo(pos, true);
-  showSidebar(name);
+    flyTo(pos, true);
+    showSidebar(name);
+  }).catch(err => console.error(err));
 }
 
 function showDropdown(matches) {
@@ -113,10 +206,15 @@ export function initUI() {
     raycaster.setFromCamera(mouse, camera);
     raycaster.params.Points.threshold = 0.05;
 
-    const intersects = raycaster.intersectObject(points);
+    let idx = -1;
+    if (pickGrid) {
+      idx = pickFromGrid(raycaster.ray, raycaster.params.Points.threshold);
+    } else {
+      const intersects = raycaster.intersectObject(points);
+      if (intersects.length > 0) idx = slotIds[intersects[0].index];
+    }
 
-    if (intersects.length > 0) {
-      const idx = intersects[0].index;
+    if (idx >= 0) {
       const artistName = artistList[idx];
 
       input.value = artistName;
@@ -132,7 +230,9 @@ export function initUI() {
       return;
     }
 
-    const matches = artistList.filter(name => name.toLowerCase().includes(query));
+    const matches = searchIndex
+      ? searchArtists(searchIndex, query)
+      : artistList.filter(name => name.toLowerCase().includes(query));
     showDropdown(matches);
   });
 
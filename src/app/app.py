@@ -1,36 +1,333 @@
 #!usr/env/bin python3
 
-from utils.lastfm import LastFM
-from utils.graph import Graph
-from utils.galaxy import GalaxyGraph
+import argparse
+import time
 
+from pathlib import Path
 
-def app():
-    regen = False           # Set to true if you wish to generate everything from scratch
-                            # (including the initial top artists)
+from utils.artifacts import ArtifactManifest
+from utils.instrument import RunReport, set_report
 
-    LastFM(
-        regen=regen,
 
-        top_limit=1000,     # Amount of initial top artists.
+# Heavy dependencies (requests, gensim, plotly, scikit-learn) are imported by
+# the stages that need them, so e.g. a layout-only run never loads them.
 
-        depth=3,            # Recursion depth. For example, with a recursion depth of 3: 
-                            # for each of the artists similar to one of the top artists, 
-                            # the most similar artists are collected, after which this process 
-                            # repeats for each of those artists for 2 more iterations.
+STAGES = ("crawl", "enrich", "graph", "embed", "neighbours", "layout", "export")
 
-        similar_limit=5     # Amount of similar artist included for each artist. Increasing this 
-                            # may improve the quality of the embeddings.
+
+class Pipeline:
+    # Runs the selected stages in pipeline order. graph, embed, neighbours,
+    # layout and export are skipped when the artifact manifest (pipeline.json
+    # in the cache directory) shows that their outputs were made from the
+    # current inputs with the same parameters. crawl is skipped while its
+    # parameters are unchanged, enrich runs after every crawl. Both resume
+    # through their own caches.
+
+    def __init__(self, args):
+        self.args = args
+        self.cache_dir = Path(args.cache_dir)
+        self.artifacts = ArtifactManifest(self.cache_dir / "pipeline.json", root=self.cache_dir)
+        self.force = set(STAGES) if args.regen else set(args.force)
+        self.ran = set()
+        self.graph = None
+        self.galaxy = None
+
+
+    def files(self, *names):
+        return [self.cache_dir / name for name in names]
+
+
+    def run(self, stages):
+        for stage in STAGES:
+            if stage in stages:
+                getattr(self, f"run_{stage}")()
+
+        if self.args.show:
+            self.load_galaxy("embeddings_3d", "layout").visualize_spiral_galaxy_3d_interactive()
+
+
+    def run_stage(self, stage, inputs, params, outputs, func):
+        if stage not in self.force and self.artifacts.is_fresh(stage, inputs, params, outputs):
+            print(f"Stage {stage} is up to date, skipping.")
+            return
+        func()
+        self.ran.add(stage)
+        self.artifacts.record(stage, inputs, params, outputs)
+
+
+    def load_galaxy(self, *parts):
+        # GalaxyGraph with the results of this run, completed with the saved
+        # results of earlier runs for the given parts: "graph", "embeddings",
+        # "embeddings_3d" and "layout".
+        from utils.galaxy import GalaxyGraph
+        from utils.graph import Graph
+
+        if self.graph is None:
+            self.graph = Graph(self.cache_dir, regen=self.args.regen, build=False)
+        if "graph" in parts and self.graph.csr is None:
+            self.graph.load_graph()
+
+        if self.galaxy is None:
+            self.galaxy = GalaxyGraph(self.graph, regen=True, incremental=self.args.incremental, build=False)
+        else:
+            self.galaxy.share_graph(self.graph)
+
+        if "embeddings" in parts and self.galaxy.embeddings is None:
+            self.galaxy.load_embeddings()
+        if "embeddings_3d" in parts and self.galaxy.embeddings_3d is None:
+            self.galaxy.load_embeddings_3d()
+        if "layout" in parts and self.galaxy.galaxy_positions is None:
+            self.galaxy.load_layout()
+        return self.galaxy
+
+
+    def lastfm(self, stages, regen=False, recrawl=False):
+        from utils.lastfm import LastFM
+
+        return LastFM(
+            regen=regen,
+            top_limit=self.args.top_limit,
+            depth=self.args.depth,
+            similar_limit=self.args.similar_limit,
+            cache_dir=self.cache_dir,
+            workers=self.args.workers,
+            rate_limit=self.args.rate_limit,
+            cache_backend=self.args.cache_backend,
+            stages=stages,
+            recrawl=recrawl
+        )
+
+
+    def run_crawl(self):
+        # The crawl results live in the similar artists cache, only the crawl
+        # parameters are compared. A rerun keeps the cached artists and
+        # fetches the missing ones, --regen fetches all of them again.
+        from utils.cache import open_cache
+
+        params = {
+            "top_limit": self.args.top_limit,
+            "depth": self.args.depth,
+            "similar_limit": self.args.similar_limit,
+        }
+
+        if "crawl" not in self.artifacts.stages and "crawl" not in self.force:
+            # Crawl results from before pipeline.json are taken as they are.
+            cache = open_cache(self.args.cache_backend, self.cache_dir)
+            try:
+                exists = cache.exists() or (self.cache_dir / "artists_tags.json").exists()
+            finally:
+                cache.close()
+            if exists:
+                print("Using the existing crawl results.")
+                self.artifacts.record("crawl", [], params, [])
+                return
+
+        self.run_stage(
+            "crawl",
+            [],
+            params,
+            [],
+            lambda: self.lastfm(stages=("crawl",), regen=self.args.regen, recrawl=True)
+        )
+
+
+    def run_enrich(self):
+        # Rebuilds artists_tags.json after a crawl or when forced, only new
+        # and changed artists are fetched (see EnrichmentStore). Otherwise
+        # the existing file is used, which needs no api key.
+        regen = self.args.regen or "enrich" in self.force or "crawl" in self.ran
+        if not regen and (self.cache_dir / "artists_tags.json").exists():
+            print("Stage enrich is up to date, skipping.")
+            return
+        self.lastfm(stages=("enrich",), regen=regen)
+
+
+    def run_graph(self):
+        def build():
+            from utils.graph import Graph
+
+            self.graph = Graph(self.cache_dir, regen=self.args.regen, build=False)
+            self.graph.load_dict_file()
+            self.graph.build_graph(max_nodes=self.args.max_nodes)
+
+        self.run_stage(
+            "graph",
+            self.files("artists_tags.json"),
+            {"max_nodes": self.args.max_nodes},
+            self.files("graph_csr.npz", "graph_nodes.json"),
+            build
+        )
+
+
+    def run_embed(self):
+        def embed():
+            galaxy = self.load_galaxy("graph")
+            galaxy.compute_node2vec_embeddings(
+                dimensions=self.args.dimensions,
+                walk_length=self.args.walk_length,
+                num_walks=self.args.num_walks,
+                p=self.args.p,
+                q=self.args.q,
+                workers=self.args.embed_workers
+            )
+            galaxy.reduce_embeddings_3d()
+
+        self.run_stage(
+            "embed",
+            self.files("graph_csr.npz", "graph_nodes.json"),
+            {
+                "dimensions": self.args.dimensions,
+                "walk_length": self.args.walk_length,
+                "num_walks": self.args.num_walks,
+                "p": self.args.p,
+                "q": self.args.q,
+                "incremental": self.args.incremental,
+            },
+            self.files(
+                "node2vec_embeddings.npy",
+                "node2vec_nodes.json",
+                "embeddings_3d.npy",
+                "embeddings_3d_nodes.json",
+                "pca_basis.npz"
+            ),
+            embed
         )
 
-    graph = Graph(regen=regen)
 
-    galaxy = GalaxyGraph(graph, regen=regen)
+    def run_layout(self):
+        def layout():
+            galaxy = self.load_galaxy("embeddings_3d")
+            galaxy.spiral_warp(spiral_strength=self.args.spiral_strength, z_scale=self.args.z_scale)
+            galaxy.build_spatial_index(min_distance=self.args.min_distance)
+            galaxy.save_layout()
+
+        self.run_stage(
+            "layout",
+            self.files("embeddings_3d.npy", "embeddings_3d_nodes.json", "pca_basis.npz"),
+            {
+                "spiral_strength": self.args.spiral_strength,
+                "z_scale": self.args.z_scale,
+                "min_distance": self.args.min_distance,
+            },
+            self.files("galaxy_positions.npy"),
+            layout
+        )
+
+
+    def run_neighbours(self):
+        # The all-pairs top-k only depends on the embeddings and the tags, a
+        # new layout does not repeat it.
+        def neighbours():
+            galaxy = self.load_galaxy("graph", "embeddings")
+            galaxy.export_neighbours()
+            galaxy.build_tag_matrix(min_count=self.args.min_tag_count, max_tags=self.args.max_tags)
+            galaxy.export_hybrid_neighbours(alpha=self.args.alpha)
+
+        self.run_stage(
+            "neighbours",
+            self.files("node2vec_embeddings.npy", "node2vec_nodes.json", "artists_tags.json", "all_tags.json"),
+            {"alpha": self.args.alpha, "min_tag_count": self.args.min_tag_count, "max_tags": self.args.max_tags},
+            self.files("artist_neighbours.json", "artist_neighbours_hybrid.json"),
+            neighbours
+        )
+
+
+    def run_export(self):
+        def export():
+            galaxy = self.load_galaxy("graph", "embeddings_3d", "layout")
+            galaxy.export_to_json(sharded=True, neighbours=False)
+
+        self.run_stage(
+            "export",
+            self.files(
+                "galaxy_positions.npy",
+                "embeddings_3d_nodes.json",
+                "graph_csr.npz",
+                "graph_nodes.json",
+                "artists_tags.json",
+                "all_tags.json"
+            ),
+            {},
+            # Every file of the export: shards, grid, search index and LOD.
+            self.files("galaxy"),
+            export
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the music galaxy. Runs all stages by default, or only the given ones."
+    )
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"Stages to run, any of: {', '.join(STAGES)}. All of them by default.")
+    parser.add_argument("--cache-dir", default="data/cache")
+    parser.add_argument("--regen", action="store_true",
+                        help="Generate everything from scratch, including the initial top artists.")
+    parser.add_argument("--force", nargs="+", default=[], choices=STAGES, metavar="stage",
+                        help="Run these stages even when their outputs are up to date.")
+    parser.add_argument("--show", action="store_true", help="Open the interactive 3D plot of the galaxy.")
+
+    crawl = parser.add_argument_group("crawl and enrich")
+    crawl.add_argument("--top-limit", type=int, default=1000, help="Amount of initial top artists.")
+    crawl.add_argument("--depth", type=int, default=3,
+                       help="Recursion depth: with 3, the similar artists of the top artists are collected, "
+                            "then theirs, and once more.")
+    crawl.add_argument("--similar-limit", type=int, default=5,
+                       help="Amount of similar artists per artist. Artists that are already cached keep their "
+                            "similar artists, use --regen to fetch all of them again.")
+    crawl.add_argument("--workers", type=int, default=8, help="Requests kept in flight while crawling and enriching.")
+    crawl.add_argument("--rate-limit", type=float, default=5.0,
+                       help="Maximum Last.fm requests per second, shared by all workers.")
+    crawl.add_argument("--cache-backend", choices=["json", "sqlite"], default="json",
+                       help="Storage of the crawled data: one JSON file per artist or a single SQLite database.")
+
+    graph = parser.add_argument_group("graph and embed")
+    graph.add_argument("--max-nodes", type=int, default=None, help="Only use the first artists of artists_tags.json.")
+    graph.add_argument("--incremental", action="store_true",
+                       help="Only retrain the changed part of the graph and keep existing artists at their place.")
+    graph.add_argument("--dimensions", type=int, default=64)
+    graph.add_argument("--walk-length", type=int, default=30)
+    graph.add_argument("--num-walks", type=int, default=200)
+    graph.add_argument("--p", type=float, default=1.0, help="Node2Vec return parameter.")
+    graph.add_argument("--q", type=float, default=0.5, help="Node2Vec in-out parameter.")
+    graph.add_argument("--embed-workers", type=int, default=None, help="Walk and Word2Vec workers (all CPUs by default).")
+
+    layout = parser.add_argument_group("neighbours, layout and export")
+    layout.add_argument("--spiral-strength", type=float, default=1.5)
+    layout.add_argument("--z-scale", type=float, default=0.3)
+    layout.add_argument("--min-distance", type=float, default=0.004,
+                        help="Pushes apart stars closer than this, so each star can be clicked.")
+    layout.add_argument("--alpha", type=float, default=0.7,
+                        help="Weight of the embeddings against the tags in artist_neighbours_hybrid.json.")
+    layout.add_argument("--min-tag-count", type=int, default=100,
+                        help="Leave out tags with a lower total weight in all_tags.json from the hybrid neighbours.")
+    layout.add_argument("--max-tags", type=int, default=10000,
+                        help="Only use this many of the most used tags for the hybrid neighbours.")
+
+    report = parser.add_argument_group("run report")
+    report.add_argument("--report-dir", default=None,
+                        help="Directory for the run reports and profiles, reports/ next to the cache directory by default.")
+    report.add_argument("--profile", nargs="+", default=[], metavar="stage",
+                        help="Stages to run under cProfile, e.g. embed. Profiles are written to the report directory.")
+    report.add_argument("--trace-memory", nargs="+", default=[], metavar="stage",
+                        help="Stages to run under tracemalloc, e.g. graph.")
+
+    args = parser.parse_args(argv)
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return args
+
+
+def app(args):
+    report_dir = Path(args.report_dir) if args.report_dir else Path(args.cache_dir).parent / "reports"
+    report = set_report(RunReport(profile=args.profile, trace_memory=args.trace_memory, profile_dir=report_dir))
+
+    Pipeline(args).run(args.stages or STAGES)
 
-    galaxy.spiral_warp()
-    galaxy.visualize_spiral_galaxy_3d_interactive()
-    galaxy.export_to_json()
+    report.print_summary()
+    report.write(report_dir / f"run_{time.strftime('%Y%m%d_%H%M%S')}.json")
 
 
 if __name__ == "__main__":
-    app()
+    app(parse_args())
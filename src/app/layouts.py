@@ -0,0 +1,102 @@
+#!usr/env/bin python3
+
+import argparse
+import json
+import time
+import numpy as np
+
+from pathlib import Path
+
+from utils.layout import LAYOUT_PRESETS, LayoutPipeline
+
+
+def load_layout_input(cache_dir):
+    # The cached output of GalaxyGraph.reduce_embeddings_3d(), no embeddings
+    # or graph needed.
+    cache_dir = Path(cache_dir)
+    embeddings_3d = np.load(cache_dir / "embeddings_3d.npy")
+    with open(cache_dir / "embeddings_3d_nodes.json", "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+
+    center = None
+    basis_file = cache_dir / "pca_basis.npz"
+    if basis_file.exists():
+        center = np.load(basis_file)["center"].tolist()
+    return nodes, embeddings_3d, center
+
+
+def render(name, nodes, positions, html_file):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(
+        data=[
+            go.Scatter3d(
+                x=positions[:, 0],
+                y=positions[:, 1],
+                z=positions[:, 2],
+                mode="markers",
+                marker=dict(
+                    size=2,
+                    opacity=0.7
+                ),
+                text=nodes,
+                hoverinfo="text"
+            )
+        ]
+    )
+    fig.update_layout(
+        title=f"Artist Similarity Galaxy ({name})",
+        scene=dict(aspectmode="data"),
+        margin=dict(l=0, r=0, t=40, b=0),
+    )
+    fig.write_html(html_file)
+
+
+def run_layouts(cache_dir, specs, out_dir, render_html=False):
+    nodes, embeddings_3d, center = load_layout_input(cache_dir)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Applying {len(specs)} layouts to {len(nodes)} artists...")
+    for name, spec in specs.items():
+        # The stored center keeps the layouts comparable with the galaxy.
+        spec = [dict(entry, center=center) if entry["stage"] == "center" and "center" not in entry else entry
+                for entry in spec]
+        pipeline = LayoutPipeline.from_spec(spec)
+
+        start = time.perf_counter()
+        positions = pipeline(embeddings_3d)
+        elapsed = time.perf_counter() - start
+
+        # Same format as galaxy/positions.bin, rows follow embeddings_3d_nodes.json.
+        np.asarray(positions, dtype="<f4").tofile(out_dir / f"{name}.bin")
+        with open(out_dir / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(spec, f, indent=2)
+
+        if render_html:
+            render(name, nodes, positions, out_dir / f"{name}.html")
+
+        print(f"* {name}: {elapsed * 1000:.1f} ms")
+
+    print(f"Layouts written to {out_dir}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply several galaxy layouts to the cached 3D embeddings.")
+    parser.add_argument("presets", nargs="*", help=f"Presets to run (default: all of {sorted(LAYOUT_PRESETS)}).")
+    parser.add_argument("--spec", default=None, help="JSON file mapping layout names to lists of stages.")
+    parser.add_argument("--cache-dir", default="data/cache")
+    parser.add_argument("--out", default=None, help="Output directory (default: <cache_dir>/layouts).")
+    parser.add_argument("--render", action="store_true", help="Also write an interactive HTML plot per layout.")
+    args = parser.parse_args()
+
+    specs = {}
+    if args.spec:
+        with open(args.spec, "r", encoding="utf-8") as f:
+            specs.update(json.load(f))
+    for preset in args.presets or ([] if args.spec else LAYOUT_PRESETS):
+        if preset not in LAYOUT_PRESETS:
+            parser.error(f"Unknown preset {preset!r}, expected one of {sorted(LAYOUT_PRESETS)}")
+        specs[preset] = LAYOUT_PRESETS[preset]
+
+    run_layouts(args.cache_dir, specs, args.out or Path(args.cache_dir) / "layouts", render_html=args.render)
@@ -0,0 +1,448 @@
+import argparse
+import json
+import threading
+import time
+import traceback
+import numpy as np
+
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from utils.cache import normalize_name
+from utils.galaxy import fnv1a_32
+from utils.search import SearchIndex
+from utils.similarity import MappedSimilarityIndex
+from utils.spatial import SpatialIndex
+
+
+# Local query service over the exported galaxy: the node2vec embeddings and
+# the star positions are memory-mapped once at startup, so every request is a
+# single matrix-vector product or KD-tree lookup instead of rebuilding the
+# GalaxyGraph. Run the pipeline with the sharded export first, then
+#
+#   python src/app/serve.py --cache-dir data/cache
+#
+# GET  /similar?artist=NAME&k=10           top-k by embedding similarity
+# GET  /nearest?artist=NAME&k=10           k closest stars in the galaxy
+# GET  /nearest?x=0&y=0&z=0&k=10           ... or closest to a point
+# GET  /artist?artist=NAME                 tags, bio, links and position
+# GET  /search?q=TEXT&limit=10             artist names for a search box
+# POST /batch {"queries": [{"endpoint": "similar", "artist": NAME, "k": 10}, ...]}
+# GET  /metrics                            request counts, latencies, cache hits
+
+MAX_K = 100
+MAX_BATCH = 1000
+
+
+class QueryError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    # Thread-safe least-recently-used cache of query results.
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+    def summary(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+class LatencyStats:
+    # Per-endpoint request counts and latencies. Percentiles are taken over
+    # the last window requests of every endpoint.
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+
+    def record(self, endpoint, seconds, error=False):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "latency": 0.0,
+                    "recent": deque(maxlen=self.window),
+                }
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["latency"] += seconds
+            stats["recent"].append(seconds)
+
+
+    def summary(self):
+        with self.lock:
+            endpoints = {endpoint: (dict(stats), np.array(stats["recent"])) for endpoint, stats in self.endpoints.items()}
+
+        summary = {}
+        for endpoint, (stats, recent) in endpoints.items():
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1000 if len(recent) else (0.0, 0.0, 0.0)
+            summary[endpoint] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "mean_ms": round(stats["latency"] / stats["requests"] * 1000, 4),
+                "p50_ms": round(float(p50), 4),
+                "p95_ms": round(float(p95), 4),
+                "p99_ms": round(float(p99), 4),
+            }
+        return summary
+
+
+class GalaxyService:
+    # Read-only view of the galaxy artifacts. Artist ids are the rows of
+    # galaxy/names.json, which is also the row order of the embeddings.
+
+    def __init__(self, cache_dir, cache_size=4096):
+        self.cache_dir = Path(cache_dir)
+        galaxy_dir = self.cache_dir / "galaxy"
+
+        with open(galaxy_dir / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        with open(galaxy_dir / self.manifest["names"], "r", encoding="utf-8") as f:
+            self.names = json.load(f)
+        with open(self.cache_dir / "node2vec_nodes.json", "r", encoding="utf-8") as f:
+            if json.load(f) != self.names:
+                raise ValueError(f"The embeddings in {self.cache_dir} do not match the galaxy export, export again.")
+
+        self.node_index = {name: i for i, name in enumerate(self.names)}
+        self.folded_index = {}
+        for i, name in enumerate(self.names):
+            self.folded_index.setdefault(normalize_name(name), i)
+
+        self.embeddings = np.load(self.cache_dir / "node2vec_embeddings.npy", mmap_mode="r")
+        self.similarity = MappedSimilarityIndex(self.embeddings)
+
+        self.positions = np.memmap(galaxy_dir / self.manifest["positions"], dtype="<f4", mode="r").reshape(-1, 3)
+        self.spatial = SpatialIndex(self.positions)
+
+        self.search_index = SearchIndex.load(galaxy_dir) if "search" in self.manifest else None
+
+        self.details_dir = galaxy_dir
+        self.shards = {}
+        self.shards_lock = threading.Lock()
+
+        self.cache = LRUCache(cache_size)
+        self.metrics = LatencyStats()
+        self.started = time.time()
+
+
+    def resolve(self, name):
+        # Exact name first, then case- and normalization-insensitive.
+        if name is None:
+            raise QueryError("Missing parameter 'artist'.")
+        i = self.node_index.get(name)
+        if i is None:
+            i = self.folded_index.get(normalize_name(name))
+        if i is None:
+            raise QueryError(f"Unknown artist {name!r}.", status=404)
+        return i
+
+
+    def _k(self, k):
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            raise QueryError(f"Invalid k {k!r}.")
+        return max(1, min(MAX_K, k))
+
+
+    def _cached(self, key, compute):
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.put(key, result)
+        return result
+
+
+    def _similar_result(self, i, idx, scores):
+        return {
+            "artist": self.names[i],
+            "similar": [{"artist": self.names[j], "score": round(float(s), 6)} for j, s in zip(idx, scores) if j >= 0],
+        }
+
+
+    def similar(self, artist, k=10):
+        i = self.resolve(artist)
+        k = self._k(k)
+
+        def compute():
+            idx, scores = self.similarity.query_ids(i, k=k)
+            return self._similar_result(i, idx[0], scores[0])
+
+        return self._cached(("similar", i, k), compute)
+
+
+    def similar_many(self, artists, k=10):
+        # Uncached queries of a batch share one matrix-matrix product.
+        k = self._k(k)
+        ids = [self.resolve(artist) for artist in artists]
+        results = [self.cache.get(("similar", i, k)) for i in ids]
+
+        missing = sorted({i for i, result in zip(ids, results) if result is None})
+        if missing:
+            idx, scores = self.similarity.query_ids(missing, k=k)
+            computed = {}
+            for row, i in enumerate(missing):
+                computed[i] = self._similar_result(i, idx[row], scores[row])
+                self.cache.put(("similar", i, k), computed[i])
+            results = [computed[i] if result is None else result for i, result in zip(ids, results)]
+        return results
+
+
+    def nearest(self, artist=None, k=10, x=None, y=None, z=None):
+        k = self._k(k)
+        if artist is None:
+            try:
+                point = (float(x), float(y), float(z))
+            except (TypeError, ValueError):
+                raise QueryError("Give either 'artist' or all of 'x', 'y' and 'z'.")
+            if not np.all(np.isfinite(point)):
+                raise QueryError("Coordinates 'x', 'y' and 'z' must be finite numbers.")
+
+            def compute():
+                ids, distances = self.spatial.nearest(point, k=k)
+                return {"point": list(point), "nearest": self._nearest_list(ids, distances)}
+
+            return self._cached(("nearest", point, k), compute)
+
+        i = self.resolve(artist)
+
+        def compute():
+            # One extra neighbour, as the closest star is the artist itself.
+            ids, distances = self.spatial.nearest(self.spatial.positions[i], k=k + 1)
+            keep = ids != i
+            return {"artist": self.names[i], "nearest": self._nearest_list(ids[keep][:k], distances[keep][:k])}
+
+        return self._cached(("nearest", i, k), compute)
+
+
+    def _nearest_list(self, ids, distances):
+        return [{"artist": self.names[j], "distance": round(float(d), 6)} for j, d in zip(ids, distances)]
+
+
+    def _shard(self, shard):
+        # Details shards are loaded on first use and kept.
+        with self.shards_lock:
+            if shard not in self.shards:
+                path = self.details_dir / self.manifest["details"].format(shard=f"{shard:03d}")
+                with open(path, "r", encoding="utf-8") as f:
+                    self.shards[shard] = json.load(f)
+            return self.shards[shard]
+
+
+    def artist(self, artist):
+        i = self.resolve(artist)
+
+        def compute():
+            name = self.names[i]
+            details = self._shard(fnv1a_32(name) % self.manifest["shards"]).get(name, {})
+            return {"artist": name, "position": self.positions[i].tolist(), **details}
+
+        return self._cached(("artist", i), compute)
+
+
+    def search(self, q, limit=10):
+        if self.search_index is None:
+            raise QueryError("This export has no search index, export again.", status=404)
+        if q is None:
+            raise QueryError("Missing parameter 'q'.")
+        limit = self._k(limit)
+        return self._cached(("search", q, limit), lambda: {"query": q, "artists": self.search_index.search(q, limit=limit)})
+
+
+    def batch(self, queries):
+        # Runs a list of {"endpoint": ..., **params} queries. Failed queries
+        # give an {"error": ...} entry instead of failing the whole batch.
+        if not isinstance(queries, list):
+            raise QueryError("Expected {\"queries\": [...]}.")
+        if len(queries) > MAX_BATCH:
+            raise QueryError(f"At most {MAX_BATCH} queries per batch.")
+
+        results = [None] * len(queries)
+        similar = {}
+        for q, query in enumerate(queries):
+            if not isinstance(query, dict):
+                results[q] = {"error": "Expected an object."}
+                continue
+            params = dict(query)
+            endpoint = params.pop("endpoint", None)
+            try:
+                if endpoint == "similar":
+                    # Resolved here so a bad name only fails its own query.
+                    self.resolve(params.get("artist"))
+                    similar.setdefault(self._k(params.get("k", 10)), []).append((q, params["artist"]))
+                elif endpoint == "nearest":
+                    results[q] = self.nearest(**params)
+                elif endpoint == "artist":
+                    results[q] = self.artist(params.get("artist"))
+                elif endpoint == "search":
+                    results[q] = self.search(**params)
+                else:
+                    raise QueryError(f"Unknown endpoint {endpoint!r}.")
+            except QueryError as e:
+                results[q] = {"error": str(e)}
+            except TypeError:
+                results[q] = {"error": f"Invalid parameters for {endpoint!r}."}
+
+        for k, group in similar.items():
+            for (q, _), result in zip(group, self.similar_many([artist for _, artist in group], k=k)):
+                results[q] = result
+        return {"results": results}
+
+
+    def summary(self):
+        return {
+            "artists": len(self.names),
+            "dimensions": int(self.embeddings.shape[1]),
+            "uptime": round(time.time() - self.started, 1),
+            "cache": self.cache.summary(),
+            "endpoints": self.metrics.summary(),
+        }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+    def _send(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def _handle(self, endpoint, run):
+        start = time.perf_counter()
+        error = False
+        try:
+            data, status = run(), 200
+        except QueryError as e:
+            data, status = {"error": str(e)}, e.status
+            error = True
+        except Exception:
+            # Answer anyway, the client would otherwise only see a dropped
+            # connection.
+            self.log_error("Error in /%s:\n%s", endpoint, traceback.format_exc())
+            data, status = {"error": "Internal server error."}, 500
+            error = True
+        self._send(data, status)
+        self.service.metrics.record(endpoint, time.perf_counter() - start, error=error)
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        endpoint = url.path.strip("/")
+
+        if endpoint == "similar":
+            self._handle(endpoint, lambda: self.service.similar(params.get("artist"), params.get("k", 10)))
+        elif endpoint == "nearest":
+            self._handle(endpoint, lambda: self.service.nearest(
+                params.get("artist"), params.get("k", 10), params.get("x"), params.get("y"), params.get("z")
+            ))
+        elif endpoint == "artist":
+            self._handle(endpoint, lambda: self.service.artist(params.get("artist")))
+        elif endpoint == "search":
+            self._handle(endpoint, lambda: self.service.search(params.get("q"), params.get("limit", 10)))
+        elif endpoint == "metrics":
+            self._send(self.service.summary())
+        else:
+            self._send({"error": f"Unknown endpoint {url.path!r}."}, status=404)
+
+
+    def do_POST(self):
+        endpoint = urlparse(self.path).path.strip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+
+        if endpoint != "batch":
+            self._send({"error": f"Unknown endpoint /{endpoint}."}, status=404)
+            return
+
+        def run():
+            try:
+                queries = json.loads(body or b"{}").get("queries")
+            except (ValueError, AttributeError):
+                raise QueryError("Invalid JSON body.")
+            return self.service.batch(queries)
+
+        self._handle(endpoint, run)
+
+
+def start_server(service, host="127.0.0.1", port=8000, verbose=False):
+    handler = type("Handler", (QueryHandler,), {"service": service, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve similarity, nearest-star and artist queries over the exported galaxy.")
+    parser.add_argument("--cache-dir", default="data/cache")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=4096, help="Cached query results (0 disables the cache).")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = GalaxyService(args.cache_dir, cache_size=args.cache_size)
+    server, url = start_server(service, args.host, args.port, args.verbose)
+    print(f"Loaded {len(service.names)} artists in {time.perf_counter() - start:.2f}s, listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
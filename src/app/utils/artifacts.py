@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+from pathlib import Path
+
+from utils.checkpoint import source_hash
+
+
+class ArtifactManifest:
+    # Record of the last run of every pipeline stage: the content hashes of
+    # the files it read and wrote and the parameters it ran with. A stage is
+    # up to date while all of them still match, so a rerun only repeats the
+    # stages whose inputs or parameters changed. File hashes are cached by
+    # size and modification time, unchanged files are not read again.
+
+    def __init__(self, path, root=None):
+        self.path = Path(path)
+        self.root = Path(root) if root is not None else self.path.parent
+        self.files = {}
+        self.stages = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.files = data.get("files", {})
+                self.stages = data.get("stages", {})
+            except ValueError:
+                print(f"{self.path} is not valid JSON, all stages will run.")
+
+
+    def _key(self, path):
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+
+    def file_hash(self, path):
+        # sha1 of the file contents, None for missing files. A directory
+        # hashes the names and contents of all files below it.
+        if os.path.isdir(path):
+            return self.dir_hash(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = self._key(path)
+        cached = self.files.get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha1"]
+
+        digest = hashlib.sha1()
+        if str(path).endswith(".npz"):
+            # numpy writes the time into the zip headers, only the arrays count.
+            with zipfile.ZipFile(path) as archive:
+                for name in sorted(archive.namelist()):
+                    digest.update(name.encode("utf-8"))
+                    with archive.open(name) as f:
+                        for chunk in iter(lambda: f.read(2**20), b""):
+                            digest.update(chunk)
+        else:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(2**20), b""):
+                    digest.update(chunk)
+        self.files[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest.hexdigest()}
+        return digest.hexdigest()
+
+
+    def dir_hash(self, path):
+        digest = hashlib.sha1()
+        for file in sorted(p for p in Path(path).rglob("*") if p.is_file()):
+            digest.update(self._key(file).encode("utf-8"))
+            digest.update(self.file_hash(file).encode("ascii"))
+        return digest.hexdigest()
+
+
+    def fingerprint(self, inputs, params):
+        return source_hash({
+            "inputs": {self._key(path): self.file_hash(path) for path in inputs},
+            "params": params,
+        })
+
+
+    def is_fresh(self, stage, inputs, params, outputs):
+        # True when the outputs were made from the current inputs with the
+        # same parameters and have not been changed or removed since.
+        record = self.stages.get(stage)
+        if record is None or record["fingerprint"] != self.fingerprint(inputs, params):
+            return False
+        return all(
+            self.file_hash(path) is not None and self.file_hash(path) == record["outputs"].get(self._key(path))
+            for path in outputs
+        )
+
+
+    def record(self, stage, inputs, params, outputs):
+        self.stages[stage] = {
+            "fingerprint": self.fingerprint(inputs, params),
+            "params": params,
+            "outputs": {self._key(path): self.file_hash(path) for path in outputs},
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.save()
+
+
+    def save(self):
+        # Hashes of removed files (e.g. old shards) are dropped.
+        self.files = {key: value for key, value in self.files.items() if (self.root / key).is_file()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "stages": self.stages}, f, indent=2)
+        os.replace(tmp_file, self.path)
@@ -0,0 +1,164 @@
+import codecs
+import json
+import os
+import re
+import threading
+
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class IncompleteEntry(Exception):
+    pass
+
+
+class ArtistsFile:
+    # Streaming access to artists_tags.json. The top-level object is parsed
+    # one artist at a time with raw_decode over chunks of the file, so only
+    # the current chunk and entry are held in memory. The byte range of every
+    # entry is kept, details() reads a single entry back on demand.
+
+    def __init__(self, path, chunk_size=2**20):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offsets = {}
+        self.lock = threading.Lock()
+        self._file = None
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+
+    def _parse_entry(self, buffer, pos, decoder):
+        # One '"name": {...}' member starting at pos, after the separator.
+        try:
+            name, pos = decoder.raw_decode(buffer, pos)
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                raise IncompleteEntry
+            if buffer[pos] != ":":
+                raise ValueError(f"Expected ':' after {name!r} in {self.path}")
+            value_start = WHITESPACE.match(buffer, pos + 1).end()
+            entry, value_end = decoder.raw_decode(buffer, value_start)
+        except json.JSONDecodeError:
+            raise IncompleteEntry
+        return name, entry, value_start, value_end
+
+
+    def iter_entries(self):
+        # Yields (name, entry) in file order and records the byte offsets.
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.offsets = {}
+
+        with open(self.path, "rb") as f:
+            buffer = ""
+            pos = 0
+            byte_pos = 0
+            eof = False
+            started = False
+
+            def read_more():
+                nonlocal buffer, pos, eof
+                chunk = f.read(self.chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+                pos = 0
+
+            read_more()
+            while True:
+                start = WHITESPACE.match(buffer, pos).end()
+                if start >= len(buffer) or (buffer[start] == "," and WHITESPACE.match(buffer, start + 1).end() >= len(buffer)):
+                    if eof:
+                        raise ValueError(f"Unexpected end of {self.path}")
+                    read_more()
+                    continue
+
+                char = buffer[start]
+                if not started:
+                    if char != "{":
+                        raise ValueError(f"{self.path} does not contain a JSON object")
+                    started = True
+                    byte_pos += len(buffer[pos:start + 1].encode("utf-8"))
+                    pos = start + 1
+                    continue
+                if char == "}":
+                    return
+                if char == ",":
+                    start = WHITESPACE.match(buffer, start + 1).end()
+
+                try:
+                    name, entry, value_start, value_end = self._parse_entry(buffer, start, decoder)
+                except IncompleteEntry:
+                    if eof:
+                        raise ValueError(f"Invalid or truncated entry in {self.path}")
+                    read_more()
+                    continue
+
+                value_offset = byte_pos + len(buffer[pos:value_start].encode("utf-8"))
+                value_length = len(buffer[value_start:value_end].encode("utf-8"))
+                self.offsets[name] = (value_offset, value_length)
+
+                byte_pos = value_offset + value_length
+                pos = value_end
+                yield name, entry
+
+
+    def build_index(self):
+        # Only the offsets, without keeping any entry.
+        for _ in self.iter_entries():
+            pass
+        return self.offsets
+
+
+    def save_index(self, index_file):
+        # The offsets are stored with the size and modification time of the
+        # file, load_index() only uses them while the file is unchanged.
+        stat = os.stat(self.path)
+        index = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "offsets": [[name, offset, length] for name, (offset, length) in self.offsets.items()],
+        }
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+
+    def load_index(self, index_file):
+        # False when the index is missing or out of date.
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        stat = os.stat(self.path)
+        if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+            return False
+        self.offsets = {name: (offset, length) for name, offset, length in index["offsets"]}
+        return True
+
+
+    def details(self, name):
+        # Full entry of one artist, None for unknown artists.
+        if name not in self.offsets:
+            return None
+        offset, length = self.offsets[name]
+        with self.lock:
+            if self._file is None:
+                self._file = open(self.path, "rb")
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return json.loads(data)
+
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+import tqdm
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+def normalize_name(name):
+    return unicodedata.normalize("NFC", name).strip().casefold()
+
+
+def resolve_stems(stems, known_names):
+    # The JSON cache stores "/" as "_" in file names, which is ambiguous. Prefer
+    # whichever spelling is referenced elsewhere in the crawl, and fall back to
+    # the historical "_" -> "/" mapping.
+    names = {}
+    for stem in stems:
+        slashed = stem.replace("_", "/")
+        if "_" not in stem or stem in known_names:
+            names[stem] = stem
+        else:
+            names[stem] = slashed
+    return names
+
+
+class ArtistCache(ABC):
+    # Storage for the raw Last.fm responses of the crawl: the similar artists of
+    # every crawled artist and the chart of top artists.
+
+    @abstractmethod
+    def exists(self):
+        pass
+
+
+    @abstractmethod
+    def init(self):
+        pass
+
+
+    @abstractmethod
+    def get_similar(self, artist_name):
+        pass
+
+
+    @abstractmethod
+    def put_similar(self, artist_name, artists):
+        pass
+
+
+    @abstractmethod
+    def iter_similar(self):
+        pass
+
+
+    @abstractmethod
+    def get_top(self, limit):
+        pass
+
+
+    @abstractmethod
+    def put_top(self, limit, artists):
+        pass
+
+
+    def close(self):
+        pass
+
+
+class JSONDirCache(ArtistCache):
+    # Original layout: one JSON file per artist in similar_artists/ and the top
+    # artists in top_artists/top_artists_{limit}.json (+ .txt).
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.top_artists_cache = self.cache_dir / "top_artists"
+        self.similar_artists_cache = self.cache_dir / "similar_artists"
+
+
+    def exists(self):
+        return os.path.exists(self.similar_artists_cache)
+
+
+    def init(self):
+        self.top_artists_cache.mkdir(parents=True, exist_ok=True)
+        self.similar_artists_cache.mkdir(parents=True, exist_ok=True)
+
+
+    def _similar_file(self, artist_name):
+        return self.similar_artists_cache / f"{artist_name.replace('/', '_')}.json"
+
+
+    def get_similar(self, artist_name):
+        cache_file = self._similar_file(artist_name)
+        if not cache_file.exists():
+            return None
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+    def put_similar(self, artist_name, artists):
+        with open(self._similar_file(artist_name), "w", encoding="utf-8") as f:
+            json.dump(artists, f, ensure_ascii=False, indent=2)
+
+
+    def iter_similar(self):
+        entries = []
+        known_names = set()
+        for file in tqdm.tqdm(list(self.similar_artists_cache.glob("*.json"))):
+            with open(file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries.append((file.stem, data))
+            known_names.update(similar.get("name") for similar in data)
+
+        for txt_cache in self.top_artists_cache.glob("top_artists_*.txt"):
+            with open(txt_cache, "r", encoding="utf-8") as f:
+                known_names.update(line.rstrip("\n") for line in f)
+
+        names = resolve_stems([stem for stem, _ in entries], known_names)
+        for stem, data in entries:
+            yield names[stem], data
+
+
+    def get_top(self, limit):
+        json_cache = self.top_artists_cache / f"top_artists_{limit}.json"
+        txt_cache = self.top_artists_cache / f"top_artists_{limit}.txt"
+
+        if not (json_cache.exists() and txt_cache.exists()):
+            return None
+        with open(json_cache, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+    def put_top(self, limit, artists):
+        json_cache = self.top_artists_cache / f"top_artists_{limit}.json"
+        txt_cache = self.top_artists_cache / f"top_artists_{limit}.txt"
+
+        with open(json_cache, "w", encoding="utf-8") as f:
+            json.dump(artists, f, ensure_ascii=False, indent=2)
+
+        with open(txt_cache, "w", encoding="utf-8") as f:
+            for artist in artists:
+                f.write(artist.get("name", "") + "\n")
+
+
+class SQLiteCache(ArtistCache):
+    # Single-file store keyed by the normalized artist name. The original
+    # spelling is kept next to the data, so names round-trip unchanged.
+
+    def __init__(self, db_file):
+        self.db_file = Path(db_file)
+        self.lock = threading.Lock()
+        self.conn = None
+
+
+    def _connect(self):
+        if self.conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS similar (key TEXT PRIMARY KEY, name TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS top (lim INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self.conn.commit()
+        return self.conn
+
+
+    def exists(self):
+        if not self.db_file.exists():
+            return False
+        with self.lock:
+            return self._connect().execute("SELECT 1 FROM similar LIMIT 1").fetchone() is not None
+
+
+    def init(self):
+        with self.lock:
+            self._connect()
+
+
+    def get_similar(self, artist_name):
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT data FROM similar WHERE key = ?", (normalize_name(artist_name),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+    def put_similar(self, artist_name, artists):
+        self.put_similar_many([(artist_name, artists)])
+
+
+    def put_similar_many(self, items):
+        rows = [
+            (normalize_name(name), name, json.dumps(artists, ensure_ascii=False))
+            for name, artists in items
+        ]
+        with self.lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO similar (key, name, data) VALUES (?, ?, ?)", rows)
+            conn.commit()
+
+
+    def iter_similar(self):
+        with self.lock:
+            rows = self._connect().execute("SELECT name, data FROM similar").fetchall()
+        for name, data in tqdm.tqdm(rows):
+            yield name, json.loads(data)
+
+
+    def get_top(self, limit):
+        with self.lock:
+            row = self._connect().execute("SELECT data FROM top WHERE lim = ?", (limit,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+    def put_top(self, limit, artists):
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO top (lim, data) VALUES (?, ?)",
+                (limit, json.dumps(artists, ensure_ascii=False))
+            )
+            conn.commit()
+
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+CACHE_BACKENDS = {
+    "json": lambda cache_dir: JSONDirCache(cache_dir),
+    "sqlite": lambda cache_dir: SQLiteCache(Path(cache_dir) / "artists.sqlite"),
+}
+
+
+def open_cache(backend, cache_dir):
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend {backend!r}, expected one of {sorted(CACHE_BACKENDS)}")
+    return CACHE_BACKENDS[backend](cache_dir)
+
+
+def migrate_json_dir(cache_dir, db_file=None, batch_size=1000):
+    source = JSONDirCache(cache_dir)
+    target = SQLiteCache(db_file or Path(cache_dir) / "artists.sqlite")
+
+    if not source.exists():
+        print(f"No similar artists cache found in {cache_dir}.")
+        return
+
+    print(f"Migrating {source.similar_artists_cache} to {target.db_file}...")
+    batch = []
+    count = 0
+    for name, artists in source.iter_similar():
+        batch.append((name, artists))
+        if len(batch) >= batch_size:
+            target.put_similar_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        target.put_similar_many(batch)
+        count += len(batch)
+
+    for json_cache in source.top_artists_cache.glob("top_artists_*.json"):
+        limit = int(json_cache.stem.rsplit("_", 1)[1])
+        target.put_top(limit, source.get_top(limit) or [])
+
+    target.close()
+    print(f"Migrated {count} artists.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the artist cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Copy a similar_artists/ JSON directory into an SQLite cache.")
+    migrate.add_argument("cache_dir", nargs="?", default="data/cache")
+    migrate.add_argument("--db", default=None, help="Target database (default: <cache_dir>/artists.sqlite).")
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate_json_dir(args.cache_dir, args.db)
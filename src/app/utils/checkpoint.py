@@ -0,0 +1,59 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+def source_hash(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class EnrichmentStore:
+    # Durable per-artist results of the enrichment stages. Every row records
+    # the hash of the similar artists data it was fetched for, so a rerun only
+    # processes artists that are new or whose similar artists changed.
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS enrichment (
+                artist TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (artist, stage)
+            )
+        """)
+        self.conn.commit()
+
+
+    def pending(self, stage, source_hashes):
+        with self.lock:
+            done = dict(self.conn.execute(
+                "SELECT artist, source_hash FROM enrichment WHERE stage = ?", (stage,)
+            ))
+        return [artist for artist, h in source_hashes.items() if done.get(artist) != h]
+
+
+    def put(self, artist, stage, source_hash, data):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO enrichment (artist, stage, source_hash, data) VALUES (?, ?, ?, ?)",
+                (artist, stage, source_hash, json.dumps(data, ensure_ascii=False))
+            )
+            self.conn.commit()
+
+
+    def get_stage(self, stage):
+        with self.lock:
+            rows = self.conn.execute("SELECT artist, data FROM enrichment WHERE stage = ?", (stage,)).fetchall()
+        return {artist: json.loads(data) for artist, data in rows}
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+import requests
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+
+class HTTPClient:
+    # Shared keep-alive session for all outgoing API calls. Requests that fail
+    # with a connection error, 429 or 5xx are sent again with exponential
+    # backoff and jitter, honouring Retry-After when the server sends one.
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+    def __init__(
+        self,
+        max_retries=5,
+        backoff=0.5,
+        max_backoff=60.0,
+        timeout=10,
+        pool_size=10,
+        headers=None
+        ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "latency": 0.0,
+        }
+        self.endpoint_stats = {}
+
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(self.max_backoff, max(0.0, delay))
+            except (TypeError, ValueError):
+                pass
+
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+    def _count(self, key, value=1, endpoint=None):
+        with self.lock:
+            self.stats[key] += value
+            if endpoint:
+                stats = self.endpoint_stats.setdefault(endpoint, dict.fromkeys(self.stats, 0))
+                stats[key] += value
+
+
+    def request(self, method, url, rate_limiter=None, endpoint=None, **kwargs):
+        # endpoint: name the request is counted under in summary(), defaults
+        # to the host and path of the url.
+        kwargs.setdefault("timeout", self.timeout)
+        if endpoint is None:
+            parsed = urlparse(url)
+            endpoint = f"{parsed.netloc}{parsed.path}"
+        response = None
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter:
+                rate_limiter.acquire()
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                error = None
+            except requests.RequestException as e:
+                response = None
+                error = e
+            self._count("requests", endpoint=endpoint)
+            self._count("latency", time.perf_counter() - start, endpoint=endpoint)
+
+            if response is not None and response.status_code not in self.RETRY_STATUS:
+                return response
+
+            if attempt < self.max_retries:
+                self._count("retries", endpoint=endpoint)
+                time.sleep(self._retry_delay(attempt, response))
+
+        self._count("failures", endpoint=endpoint)
+        if error is not None:
+            raise error
+        return response
+
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+            endpoints = {endpoint: dict(s) for endpoint, s in self.endpoint_stats.items()}
+
+        for s in [stats, *endpoints.values()]:
+            s["mean_latency"] = s["latency"] / s["requests"] if s["requests"] else 0.0
+        stats["endpoints"] = endpoints
+        return stats
@@ -1,29 +1,66 @@
 import os
 import json
 import tqdm
-import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
-import plotly.graph_objects as go
+import scipy.sparse as sp
 
 from pathlib import Path
-from node2vec import Node2Vec
-from sklearn.decomposition import PCA
 
 from utils.graph import Graph
+from utils.instrument import instrumented
+from utils.layout import spiral_pipeline
+from utils.projection import ChunkedPCA
+from utils.search import SearchIndex
+from utils.similarity import IVFIndex, SimilarityIndex
+from utils.spatial import SpatialIndex
+from utils.tags import TagMatrix, hybrid_top_k
+from utils.walks import WalkSentences, generate_walks, write_walk_corpus
+
+
+def fnv1a_32(text):
+    # Shard hash shared with the web client (docs/scripts/galaxy.js).
+    h = 0x811c9dc5
+    for byte in text.encode("utf-8"):
+        h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    return h
 
 
 class GalaxyGraph(Graph):
-    def __init__(self, graph: Graph, regen=False):
-        super().__init__()
-        self.graph = graph.graph
+    def __init__(self, graph: Graph, regen=False, incremental=False, build=True):
+        # incremental=True updates the stored model with walks from the
+        # changed part of the graph only, and keeps the positions of the
+        # artists that are already in the galaxy. build=False skips the
+        # embeddings and the reduction, for callers that load earlier results
+        # with load_embeddings(), load_embeddings_3d() and load_layout().
+        self.share_graph(graph)
         self.regen = regen
+        self.incremental = incremental
         self.embeddings = None
+        self.nodes = None
+        self.node_index = None
+        self.similarity = None
+        self.tag_matrix = None
         self.galaxy_positions = None
-        self.compute_node2vec_embeddings()
-        self.reduce_embeddings_3d()
-
-
+        self.embeddings_3d = None
+        self.layout_center = None
+        self.spatial = None
+        self.retrained = False
+        if build:
+            self.compute_node2vec_embeddings()
+            self.reduce_embeddings_3d()
+
+
+    def share_graph(self, graph):
+        # Shares the loaded data of the given graph instead of loading and
+        # building it a second time.
+        self.cache_dir = graph.cache_dir
+        self.artists_file = graph.artists_file
+        self._similar_artists_dict = graph._similar_artists_dict
+        self.csr = graph.csr
+        self._nx_graph = graph._nx_graph
+
+
+    @instrumented("embed", items=lambda self: len(self.nodes or []))
     def compute_node2vec_embeddings(
         self,
         dimensions=64,
@@ -31,92 +68,328 @@ class GalaxyGraph(Graph):
         num_walks=200,
         p=1.0,
         q=0.5,
-        workers=4
+        workers=None,
+        corpus="disk"
         ):
+        # corpus="disk" streams the walks to a temporary corpus file that gensim
+        # trains from, keeping peak memory independent of num_walks.
+        # corpus="memory" keeps all walks in one int32 matrix instead.
+
+        cache_file = self.cache_dir / "node2vec_embeddings.npy"
+        nodes_file = self.cache_dir / "node2vec_nodes.json"
+        legacy_file = self.cache_dir / "node2vec_embeddings.json"
+        model_file = self.cache_dir / "node2vec.model"
+
+        if not self.regen and not self.incremental:
+            if os.path.exists(cache_file) and os.path.exists(nodes_file):
+                print(f"Cache file {cache_file} already exists. Skipping computation.")
+                return self.load_embeddings()
+
+            if os.path.exists(legacy_file):
+                print(f"Converting {legacy_file} to {cache_file}...")
+                with open(legacy_file, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+                nodes = list(legacy.keys())
+                self.save_embeddings(nodes, np.array([legacy[n] for n in nodes], dtype=np.float32))
+                del legacy
+                return self.load_embeddings()
+
+        # Only imported when training, loading the cached embeddings does not
+        # need gensim.
+        from gensim.models import Word2Vec
+
+        workers = workers or os.cpu_count() or 1
+        n = self.csr.number_of_nodes()
+
+        if self.incremental and os.path.exists(model_file) and os.path.exists(self.cache_dir / "node2vec_graph.npz"):
+            start_nodes = self.changed_nodes()
+            if len(start_nodes) == 0:
+                print("Graph unchanged since the last training, using the cached embeddings.")
+                return self.load_embeddings()
+
+            print(f"Updating Node2Vec embeddings from {len(start_nodes)} of {n} artists...")
+            model = Word2Vec.load(str(model_file))
+            vocab = self.load_vocab()
+        else:
+            print("Computing Node2Vec embeddings...")
+            self.retrained = True
+            start_nodes = np.arange(n, dtype=np.int32)
+            model = None
+            vocab = []
+
+        # Word2Vec tokens are the positions of the artists in the persistent
+        # vocabulary, so they stay valid when the graph is rebuilt with new ids.
+        vocab_index = {name: i for i, name in enumerate(vocab)}
+        for name in self.csr.nodes:
+            if name not in vocab_index:
+                vocab_index[name] = len(vocab)
+                vocab.append(name)
+        tokens = np.array([str(vocab_index[name]) for name in self.csr.nodes], dtype=object)
+
+        batch_size = 4096
+
+        walk_batches = tqdm.tqdm(
+            generate_walks(
+                self.csr.adjacency,
+                num_walks=num_walks,
+                walk_length=walk_length,
+                p=p,
+                q=q,
+                workers=workers,
+                batch_size=batch_size,
+                start_nodes=start_nodes
+            ),
+            total=num_walks * -(-len(start_nodes) // batch_size)
+        )
 
-        cache_file = self.cache_dir / "node2vec_embeddings.json"
-
-        if os.path.exists(cache_file) and not self.regen:
-            print(f"Cache file {cache_file} already exists. Skipping computation.")
-            with open(cache_file, "r", encoding="utf-8") as f:
-                embeddings = json.load(f)
-                self.embeddings = embeddings
-                return embeddings
-
-        print("Computing Node2Vec embeddings...")
-
-        node2vec = Node2Vec(
-            self.graph,
-            dimensions=dimensions,
-            walk_length=walk_length,
-            num_walks=num_walks,
-            p=p,
-            q=q,
-            workers=workers,
-            weight_key="weight"
+        word2vec_params = dict(
+            vector_size=dimensions,
+            window=10,
+            min_count=1,
+            sg=1,
+            workers=workers
         )
 
-        print("Fitting Node2Vec model...")
+        if corpus == "disk":
+            corpus_file = self.cache_dir / "node2vec_walks.txt"
+            write_walk_corpus(walk_batches, corpus_file, tokens)
+
+            print("Fitting Node2Vec model...")
+
+            try:
+                if model is None:
+                    model = Word2Vec(corpus_file=str(corpus_file), **word2vec_params)
+                else:
+                    model.workers = workers
+                    model.build_vocab(corpus_file=str(corpus_file), update=True)
+                    model.train(
+                        corpus_file=str(corpus_file),
+                        total_words=model.corpus_total_words,
+                        epochs=model.epochs
+                    )
+            finally:
+                os.remove(corpus_file)
+        else:
+            walks = np.concatenate(list(walk_batches))
+            sentences = WalkSentences(walks, tokens)
 
-        model = node2vec.fit(window=10, min_count=1, batch_words=4)
+            print("Fitting Node2Vec model...")
+
+            if model is None:
+                model = Word2Vec(sentences, **word2vec_params)
+            else:
+                model.workers = workers
+                model.build_vocab(sentences, update=True)
+                model.train(sentences, total_examples=model.corpus_count, epochs=model.epochs)
+            del walks
 
         print("Extracting embeddings...")
 
-        embeddings = {
-            node: model.wv[node]
-            for node in self.graph.nodes()
-        }
+        nodes = self.csr.nodes
+        embeddings = model.wv.vectors[[model.wv.key_to_index[token] for token in tokens]]
 
         print("Embeddings computed.")
 
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump({node: emb.tolist() for node, emb in embeddings.items()}, f)
+        self.save_embeddings(nodes, embeddings)
+        self.save_model(model, vocab)
         print(f"Saved Node2Vec embeddings to {cache_file}.")
 
-        self.embeddings = embeddings
-        return embeddings
+        return self.load_embeddings()
+
+
+    def changed_nodes(self):
+        # Ids of the artists whose walks have to be regenerated: artists that
+        # are new or whose similar artists changed since the last training,
+        # plus their direct neighbours.
+        with open(self.cache_dir / "node2vec_nodes.json", "r", encoding="utf-8") as f:
+            old_nodes = json.load(f)
+        old_adjacency = sp.load_npz(self.cache_dir / "node2vec_graph.npz").tocoo()
+
+        adjacency = self.csr.adjacency
+        n = adjacency.shape[0]
+        node_ids = {name: i for i, name in enumerate(self.csr.nodes)}
+        old_to_new = np.array([node_ids.get(name, -1) for name in old_nodes], dtype=np.int64)
+
+        # Old adjacency in the new ids, edges to removed artists dropped.
+        rows = old_to_new[old_adjacency.row]
+        cols = old_to_new[old_adjacency.col]
+        kept = (rows >= 0) & (cols >= 0)
+        old_in_new = sp.csr_matrix((old_adjacency.data[kept], (rows[kept], cols[kept])), shape=(n, n))
+
+        diff = abs(adjacency - old_in_new).tocsr()
+        diff.eliminate_zeros()
+
+        changed = np.diff(diff.indptr) > 0
+        changed[np.setdiff1d(np.arange(n), old_to_new[old_to_new >= 0])] = True
+        # Artists that lost a neighbour because it left the graph.
+        lost = rows[(rows >= 0) & (cols < 0)]
+        changed[lost] = True
+
+        affected = changed | (adjacency @ changed.astype(np.float32) > 0)
+        return np.flatnonzero(affected).astype(np.int32)
+
 
+    def save_model(self, model, vocab):
+        # Kept for incremental updates: the trained model, the artist behind
+        # every token and the graph the embeddings were trained on.
+        model.save(str(self.cache_dir / "node2vec.model"))
 
-    def reduce_embeddings_3d(self):
-        if not self.embeddings:
+        with open(self.cache_dir / "node2vec_vocab.json", "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+
+        sp.save_npz(self.cache_dir / "node2vec_graph.npz", self.csr.adjacency)
+
+
+    def load_vocab(self):
+        with open(self.cache_dir / "node2vec_vocab.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+    def save_embeddings(self, nodes, embeddings):
+        cache_file = self.cache_dir / "node2vec_embeddings.npy"
+        nodes_file = self.cache_dir / "node2vec_nodes.json"
+
+        # Both files are written completely before either is replaced, an
+        # interrupted run leaves the previous pair in place.
+        with open(f"{cache_file}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+        with open(f"{nodes_file}.tmp", "w", encoding="utf-8") as f:
+            json.dump(nodes, f, ensure_ascii=False)
+
+        os.replace(f"{nodes_file}.tmp", nodes_file)
+        os.replace(f"{cache_file}.tmp", cache_file)
+
+
+    def load_embeddings(self):
+        # Memory-mapped, rows are aligned with self.nodes.
+        cache_file = self.cache_dir / "node2vec_embeddings.npy"
+        nodes_file = self.cache_dir / "node2vec_nodes.json"
+
+        with open(nodes_file, "r", encoding="utf-8") as f:
+            self.nodes = json.load(f)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.embeddings = np.load(cache_file, mmap_mode="r")
+        self.similarity = None
+
+        if len(self.embeddings) != len(self.nodes):
+            raise ValueError(
+                f"{cache_file} has {len(self.embeddings)} rows but {nodes_file} lists {len(self.nodes)} artists, "
+                "compute the embeddings again."
+            )
+
+        return self.embeddings
+
+
+    @instrumented("reduce", items=lambda self: len(self.nodes or []))
+    def reduce_embeddings_3d(self, method="covariance", chunk_size=65536):
+        # Works on the memory-mapped embeddings in chunks of rows, see
+        # ChunkedPCA for the methods.
+        if self.embeddings is None:
             print("Embeddings not computed yet. Please run compute_node2vec_embeddings() first.")
             return None, None
-        nodes = list(self.embeddings.keys())
-        x = np.array([self.embeddings[n] for n in nodes])
 
-        embeddings_3d = PCA(n_components=3).fit_transform(x)
-        self.nodes = nodes
+        basis_file = self.cache_dir / "pca_basis.npz"
+        layout_file = self.cache_dir / "embeddings_3d.npy"
+        layout_nodes_file = self.cache_dir / "embeddings_3d_nodes.json"
+
+        if self.incremental and not self.retrained and all(os.path.exists(f) for f in (basis_file, layout_file, layout_nodes_file)):
+            # Existing artists keep their stored 3D position, new artists are
+            # projected through the stored PCA basis.
+            basis = np.load(basis_file)
+            pca = ChunkedPCA.from_basis(basis["mean"], basis["components"])
+            old_3d = np.load(layout_file)
+            with open(layout_nodes_file, "r", encoding="utf-8") as f:
+                old_index = {node: i for i, node in enumerate(json.load(f))}
+
+            old_rows = np.array([old_index.get(node, -1) for node in self.nodes], dtype=np.int64)
+            known = old_rows >= 0
+
+            embeddings_3d = np.empty((len(self.nodes), 3), dtype=np.float64)
+            embeddings_3d[known] = old_3d[old_rows[known]]
+            new_rows = np.flatnonzero(~known)
+            if len(new_rows):
+                embeddings_3d[new_rows] = pca.transform(self.embeddings[new_rows])
+            self.layout_center = basis["center"]
+            print(f"Projected {len(new_rows)} new artists into the existing layout.")
+        else:
+            pca = ChunkedPCA(n_components=3, chunk_size=chunk_size, method=method)
+            embeddings_3d = pca.fit_transform(self.embeddings)
+            self.layout_center = embeddings_3d.mean(axis=0)
+            np.savez(
+                basis_file,
+                mean=pca.mean,
+                components=pca.components,
+                center=self.layout_center
+            )
+
+        np.save(layout_file, embeddings_3d)
+        with open(layout_nodes_file, "w", encoding="utf-8") as f:
+            json.dump(self.nodes, f, ensure_ascii=False)
+
         self.embeddings_3d = embeddings_3d
 
-        return nodes, embeddings_3d
+        return self.nodes, embeddings_3d
+
+
+    def load_embeddings_3d(self):
+        # The saved output of reduce_embeddings_3d().
+        with open(self.cache_dir / "embeddings_3d_nodes.json", "r", encoding="utf-8") as f:
+            self.nodes = json.load(f)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.embeddings_3d = np.load(self.cache_dir / "embeddings_3d.npy")
+        self.layout_center = np.load(self.cache_dir / "pca_basis.npz")["center"]
+        return self.embeddings_3d
 
 
     def spiral_warp(self, spiral_strength=1.5, z_scale=0.3):
+        # The stored center keeps the layout fixed across incremental updates.
+        return self.apply_layout(spiral_pipeline(spiral_strength, z_scale, center=self.layout_center))
+
+
+    @instrumented("layout", items=lambda self: len(self.nodes))
+    def apply_layout(self, pipeline):
+        # pipeline: a LayoutPipeline from utils.layout, applied to the 3D
+        # embeddings.
         if self.embeddings_3d is None:
             raise ValueError("Call reduce_embeddings_3d() first.")
 
-        X = self.embeddings_3d.copy()
+        self.galaxy_positions = pipeline(self.embeddings_3d)
+        self.spatial = None
+        return self.galaxy_positions
 
-        X -= X.mean(axis=0)
 
-        X[:, 2] *= z_scale
+    def build_spatial_index(self, min_distance=0.004, iterations=10):
+        # KD-tree over the galaxy positions. With min_distance set, stars
+        # closer than that are first pushed apart, so the web client never
+        # has to pick between stars that sit on top of each other.
+        if self.galaxy_positions is None:
+            raise ValueError("Call spiral_warp() first.")
 
-        x, y, z = X[:, 0], X[:, 1], X[:, 2]
-        r = np.sqrt(x**2 + y**2)
-        theta = np.arctan2(y, x)
+        self.spatial = SpatialIndex(self.galaxy_positions)
+        if min_distance:
+            n_overlapping = len(self.spatial.overlapping_pairs(min_distance))
+            self.galaxy_positions = self.spatial.relax(min_distance, iterations=iterations)
+            print(f"Relaxed {n_overlapping} overlapping pairs of stars.")
+        return self.spatial
 
-        theta_new = theta + spiral_strength * r
 
-        x_new = r * np.cos(theta_new)
-        y_new = r * np.sin(theta_new)
+    def save_layout(self):
+        # Rows follow embeddings_3d_nodes.json.
+        np.save(self.cache_dir / "galaxy_positions.npy", self.galaxy_positions)
 
-        z_new = z * z_scale
 
-        self.galaxy_positions = np.stack([x_new, y_new, z_new], axis=1)
+    def load_layout(self):
+        positions = np.load(self.cache_dir / "galaxy_positions.npy")
+        if self.nodes is not None and len(positions) != len(self.nodes):
+            raise ValueError(f"galaxy_positions.npy has {len(positions)} rows for {len(self.nodes)} artists, run the layout again.")
+        self.galaxy_positions = positions
+        self.spatial = None
         return self.galaxy_positions
 
 
     def visualize_spiral_galaxy_3d_interactive(self):
+        import plotly.graph_objects as go
+
         if not self.galaxy_positions.any():
             print("Galaxy positions has not been created yet. Run .spiral_warp() first.")
 
@@ -152,21 +425,41 @@ class GalaxyGraph(Graph):
         fig.show()
 
 
+    def build_similarity_index(self, approximate=False, **kwargs):
+        # approximate=True builds an IVF index (k-means inverted lists), which
+        # trades a little recall for much faster queries on large graphs.
+        if self.embeddings is None:
+            raise ValueError("Call compute_node2vec_embeddings() first.")
+
+        if approximate:
+            self.similarity = IVFIndex(self.embeddings, **kwargs)
+        else:
+            self.similarity = SimilarityIndex(self.embeddings)
+        return self.similarity
+
+
+    def top_k_similar(self, node_names, k=10):
+        if self.similarity is None:
+            self.build_similarity_index()
+
+        names = [name for name in node_names if name in self.node_index]
+        if not names:
+            return {}
+
+        idx, scores = self.similarity.query_ids([self.node_index[name] for name in names], k=k)
+
+        return {
+            name: [(self.nodes[j], float(score)) for j, score in zip(idx[q], scores[q]) if j >= 0]
+            for q, name in enumerate(names)
+        }
+
+
     def top_10_similar(self, node_name):
-        if node_name not in self.embeddings:
+        if node_name not in self.node_index:
             print(f"Node {node_name} not found in embeddings.")
             return []
 
-        node_embedding = self.embeddings[node_name]
-        similarities = {}
-
-        for other_node, other_embedding in self.embeddings.items():
-            if other_node == node_name:
-                continue
-            similarity = np.dot(node_embedding, other_embedding) / (np.linalg.norm(node_embedding) * np.linalg.norm(other_embedding))
-            similarities[other_node] = similarity
-
-        top_10_similar = sorted(similarities.items(), key=lambda item: item[1], reverse=True)[:10]
+        top_10_similar = self.top_k_similar([node_name], k=10)[node_name]
 
         print(f"Top 10 similar artists to {node_name}:")
         for artist, similarity in top_10_similar:
@@ -175,19 +468,13 @@ class GalaxyGraph(Graph):
 
 
     def closest_to_center(self):
-        if not self.embeddings_3d.any():
+        if self.embeddings_3d is None:
             print("3D embeddings not computed yet. Please run reduce_embeddings_3d() first.")
             return []
 
         center = np.mean(self.embeddings_3d, axis=0)
-        distances = {}
-
-        for i, node in enumerate(self.nodes):
-            embedding = self.embeddings_3d[i]
-            distance = np.linalg.norm(embedding - center)
-            distances[node] = distance
-
-        closest_artists = sorted(distances.items(), key=lambda item: item[1])[:10]
+        ids, distances = SpatialIndex(self.embeddings_3d).nearest(center, k=10)
+        closest_artists = [(self.nodes[i], float(d)) for i, d in zip(ids, distances)]
 
         print("Top 10 artists closest to the center of the galaxy:")
         for artist, distance in closest_artists:
@@ -195,39 +482,287 @@ class GalaxyGraph(Graph):
         return closest_artists
 
 
-    def export_to_json(self):
+    def artist_details(self, name):
+        # Read from artists_tags.json on demand, see Graph.load_dict_file().
+        try:
+            entry = (self.artists_file.details(name) if self.artists_file else None) or {}
+            tags = entry["tags"]
+            bio = entry["bio"]
+            links = entry["links"]
+        except KeyError:
+            tags = []
+            bio = ""
+            links = {
+                "spotify": None,
+                "youtube": None,
+                "apple_music": None
+                }
+        return {
+            "tags": tags,
+            "bio": bio,
+            "links": links
+            }
+
+
+    @instrumented("export", items=lambda self: len(self.nodes))
+    def export_to_json(self, sharded=False, neighbours=True):
+        # neighbours=False leaves out artist_neighbours.json, which only
+        # depends on the embeddings and not on the layout.
         if not self.galaxy_positions.any():
             print("Galaxy positions has not been created yet. Run .spiral_warp() first.")
+
+        if not os.path.exists(self.cache_dir):
+            print(f"{self.cache_dir} is not a valid path.")
+            return None
+
+        if sharded:
+            if self.export_sharded() is None:
+                return None
+            if neighbours:
+                self.export_neighbours()
+            return None
+
         json_data_file = self.cache_dir / "artist_galaxy.json"
 
+        if os.path.exists(json_data_file) and not self.regen:
+            print(f"Galaxy positions JSON already created at {json_data_file}, skipping creation.")
+            return None
+
         galaxy_positions_dict = {}
         for i, pos in enumerate(self.galaxy_positions):
             name = self.nodes[i]
-            try:
-                tags = self.similar_artists_dict[name]["tags"]
-                bio = self.similar_artists_dict[name]["bio"]
-                links = self.similar_artists_dict[name]["links"]
-            except KeyError:
-                tags = []
-                bio = ""
-                links = {
-                    "spotify": None,
-                    "youtube": None,
-                    "apple_music": None
-                    }
             galaxy_positions_dict[name] = {
-                "positions": list(pos),
-                "tags": tags,
-                "bio": bio,
-                "links": links
+                "positions": pos.tolist(),
+                **self.artist_details(name)
                 }
 
-        if os.path.exists(self.cache_dir):
-            if os.path.exists(json_data_file) and not self.regen:
-                print(f"Galaxy positions JSON already created at {json_data_file}, skipping creation.")
-                return None
-            with open(json_data_file, "w", encoding="utf-8") as f:
-                json.dump(galaxy_positions_dict, f, indent=2)
-                print(f"Galaxy positions JSON created at {json_data_file}.")
+        with open(json_data_file, "w", encoding="utf-8") as f:
+            json.dump(galaxy_positions_dict, f, indent=2)
+            print(f"Galaxy positions JSON created at {json_data_file}.")
+        if neighbours:
+            self.export_neighbours()
+
+
+    def export_sharded(self, n_shards=64):
+        # Split export for the web client: positions as a raw little-endian
+        # float32 buffer and names as a separate index, both needed for the
+        # first frame, and the artist details in hash-sharded files that are
+        # only fetched when the sidebar opens.
+        galaxy_dir = self.cache_dir / "galaxy"
+        manifest_file = galaxy_dir / "manifest.json"
+
+        if os.path.exists(manifest_file) and not self.regen:
+            print(f"Sharded galaxy already created at {galaxy_dir}, skipping creation.")
+            return None
+
+        details_dir = galaxy_dir / "details"
+        details_dir.mkdir(parents=True, exist_ok=True)
+        for old_shard in details_dir.glob("*.json"):
+            old_shard.unlink()
+
+        np.asarray(self.galaxy_positions, dtype="<f4").tofile(galaxy_dir / "positions.bin")
+
+        with open(galaxy_dir / "names.json", "w", encoding="utf-8") as f:
+            json.dump(self.nodes, f, ensure_ascii=False, separators=(",", ":"))
+
+        # Picking grid for the click handler of the web client.
+        if self.spatial is None:
+            self.build_spatial_index(min_distance=None)
+        with open(galaxy_dir / "grid.json", "w", encoding="utf-8") as f:
+            json.dump(self.spatial.export_grid(), f, separators=(",", ":"))
+
+        # Name search for the search box, ranked by degree in the graph.
+        csr_ids = np.array([self.csr.node_index.get(node, -1) for node in self.nodes], dtype=np.int64)
+        degrees = np.where(csr_ids >= 0, self.csr.degrees()[csr_ids], 0)
+        SearchIndex.build(self.nodes, degrees).save(galaxy_dir / "search.json")
+
+        shards = [{} for _ in range(n_shards)]
+        for name in self.nodes:
+            shards[fnv1a_32(name) % n_shards][name] = self.artist_details(name)
+
+        for shard, details in enumerate(shards):
+            with open(details_dir / f"{shard:03d}.json", "w", encoding="utf-8") as f:
+                json.dump(details, f, ensure_ascii=False, separators=(",", ":"))
+
+        manifest = {
+            "count": len(self.nodes),
+            "positions": "positions.bin",
+            "names": "names.json",
+            "grid": "grid.json",
+            "search": "search.json",
+            "shards": n_shards,
+            "hash": "fnv1a32",
+            "details": "details/{shard}.json",
+            "lod": self.export_lod(galaxy_dir),
+        }
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Sharded galaxy created at {galaxy_dir}.")
+        return galaxy_dir
+
+
+    def importance_scores(self, degree_weight=0.7):
+        # Rank-based mix of the weighted degree in the similarity graph and the
+        # popularity of the tags of every artist (tag weight times the total
+        # count of the tag in all_tags.json). Rows follow self.nodes, in [0, 1].
+        tags_file = self.cache_dir / "all_tags.json"
+        all_tags = {}
+        if os.path.exists(tags_file):
+            with open(tags_file, "r", encoding="utf-8") as f:
+                all_tags = json.load(f)
+
+        weighted_degree = np.asarray(self.csr.adjacency.sum(axis=1)).ravel()
+        csr_ids = np.array([self.csr.node_index.get(node, -1) for node in self.nodes], dtype=np.int64)
+        degree = np.where(csr_ids >= 0, weighted_degree[csr_ids], 0.0)
+
+        tag_popularity = np.array([
+            sum(weight / 100 * all_tags.get(tag, 0) for tag, weight in (self.artist_details(node)["tags"] or {}).items())
+            for node in self.nodes
+        ], dtype=np.float64)
+
+        def ranks(values):
+            out = np.empty(len(values))
+            out[np.argsort(values, kind="stable")] = np.linspace(0.0, 1.0, len(values))
+            return out
+
+        return degree_weight * ranks(degree) + (1 - degree_weight) * ranks(tag_popularity)
+
+
+    def export_lod(self, galaxy_dir, tier_size=5000, growth=4, max_depth=3):
+        # Level-of-detail tiers for the web client. Artists are sorted by
+        # importance: tier 0 holds the tier_size most important ones in one
+        # file, tier t the next tier_size * growth**t split over the cells of
+        # an octree of depth t (the last tier takes everything left). A cell
+        # file holds the int32 artist ids followed by their float32 positions,
+        # lod/cells.bin maps every artist id to the index of its file.
+        lod_dir = galaxy_dir / "lod"
+        lod_dir.mkdir(parents=True, exist_ok=True)
+        for old_file in lod_dir.glob("**/*.bin"):
+            old_file.unlink()
+
+        n = len(self.nodes)
+        positions = np.asarray(self.galaxy_positions, dtype=np.float64)
+        order = np.argsort(-self.importance_scores(), kind="stable")
+        lower = positions.min(axis=0)
+        extent = np.maximum(positions.max(axis=0) - lower, 1e-9)
+
+        files = []
+        cell_of = np.zeros(n, dtype=np.uint32)
+        start = 0
+        depth = 0
+        while start < n:
+            end = n if depth == max_depth else min(n, start + tier_size * growth**depth)
+            ids = order[start:end]
+
+            cells_per_axis = 2**depth
+            coords = np.minimum(((positions[ids] - lower) / extent * cells_per_axis).astype(np.int64), cells_per_axis - 1)
+            keys = coords[:, 0] + cells_per_axis * (coords[:, 1] + cells_per_axis * coords[:, 2])
+            cell_order = np.argsort(keys, kind="stable")
+            cells, cell_starts = np.unique(keys[cell_order], return_index=True)
+
+            (lod_dir / f"t{depth}").mkdir(exist_ok=True)
+            for cell, members in zip(cells, np.split(ids[cell_order], cell_starts[1:])):
+                cell_coords = np.array([cell % cells_per_axis, cell // cells_per_axis % cells_per_axis, cell // cells_per_axis**2])
+                file_name = f"t{depth}/{cell}.bin"
+                with open(lod_dir / file_name, "wb") as f:
+                    f.write(members.astype("<i4").tobytes())
+                    f.write(positions[members].astype("<f4").tobytes())
+
+                cell_of[members] = len(files)
+                files.append({
+                    "file": file_name,
+                    "tier": depth,
+                    "count": len(members),
+                    "min": (lower + extent * cell_coords / cells_per_axis).tolist(),
+                    "max": (lower + extent * (cell_coords + 1) / cells_per_axis).tolist(),
+                })
+
+            start = end
+            depth += 1
+
+        cell_of.astype("<u4").tofile(lod_dir / "cells.bin")
+        print(f"Level-of-detail export: {depth} tiers in {len(files)} files.")
+
+        return {
+            "dir": "lod",
+            "tiers": depth,
+            "files": files,
+            "cells": "cells.bin",
+        }
+
+
+    @instrumented("neighbours", items=lambda self: len(self.nodes))
+    def export_neighbours(self, k=10):
+        # Top-k similar artists for every artist, so the web client never has
+        # to download the embeddings. Row i of "neighbours" and "scores" holds
+        # the k entries of names[i], scores are stored in thousandths.
+        json_data_file = self.cache_dir / "artist_neighbours.json"
+
+        if self.similarity is None:
+            self.build_similarity_index()
+
+        print(f"Computing top {k} similar artists for {len(self.nodes)} artists...")
+        idx, scores = self.similarity.all_top_k(k=k)
+
+        neighbours = {
+            "k": int(idx.shape[1]),
+            "names": self.nodes,
+            "neighbours": idx.ravel().tolist(),
+            "scores": np.rint(scores.ravel() * 1000).astype(np.int32).tolist(),
+        }
+
+        with open(json_data_file, "w", encoding="utf-8") as f:
+            json.dump(neighbours, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"Similar artists JSON created at {json_data_file}.")
+
+
+    def build_tag_matrix(self, min_count=100, max_tags=10000, min_artists=2):
+        # TF-IDF artist x tag matrix over self.nodes, see TagMatrix.build()
+        # for the vocabulary pruning. Tag totals come from all_tags.json, or
+        # are summed from the artist tags when it is missing.
+        artist_tags = [self.artist_details(node)["tags"] for node in self.nodes]
+
+        tags_file = self.cache_dir / "all_tags.json"
+        if os.path.exists(tags_file):
+            with open(tags_file, "r", encoding="utf-8") as f:
+                all_tags = json.load(f)
         else:
-            print(f"{self.cache_dir} is not a valid path.")
+            print(f"{tags_file} not found, using the tag totals of {len(self.nodes)} artists.")
+            all_tags = {}
+            for tags in artist_tags:
+                for tag, weight in (tags or {}).items():
+                    all_tags[tag] = all_tags.get(tag, 0) + weight
+
+        self.tag_matrix = TagMatrix.build(artist_tags, all_tags, min_count=min_count, max_tags=max_tags, min_artists=min_artists)
+        print(f"Tag matrix: {len(self.nodes)} artists x {len(self.tag_matrix.tags)} tags, {self.tag_matrix.matrix.nnz} entries.")
+        if not self.tag_matrix.tags:
+            print("Warning: no tags left after pruning, the hybrid neighbours are the embedding neighbours.")
+        return self.tag_matrix
+
+
+    @instrumented("hybrid", items=lambda self: len(self.nodes))
+    def export_hybrid_neighbours(self, k=10, alpha=0.7):
+        # Same format as export_neighbours(), ranked by a blend of embedding
+        # and tag similarity (alpha is the weight of the embeddings). Tags
+        # place artists with few edges next to artists they sound like.
+        json_data_file = self.cache_dir / "artist_neighbours_hybrid.json"
+
+        if self.similarity is None:
+            self.build_similarity_index()
+        if self.tag_matrix is None:
+            self.build_tag_matrix()
+
+        print(f"Computing top {k} hybrid similar artists for {len(self.nodes)} artists...")
+        idx, scores = hybrid_top_k(self.similarity, self.tag_matrix, k=k, alpha=alpha)
+
+        neighbours = {
+            "k": int(idx.shape[1]),
+            "alpha": alpha,
+            "names": self.nodes,
+            "neighbours": idx.ravel().tolist(),
+            "scores": np.rint(scores.ravel() * 1000).astype(np.int32).tolist(),
+        }
+
+        with open(json_data_file, "w", encoding="utf-8") as f:
+            json.dump(neighbours, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"Hybrid similar artists JSON created at {json_data_file}.")
@@ -1,52 +1,233 @@
 import os
 import json
 import tqdm
-import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
+import scipy.sparse as sp
 
+from array import array
 from pathlib import Path
 
+from utils.artists import ArtistsFile
+from utils.instrument import instrumented
+
+
+class SimilarEdges:
+    # Edge list collected artist by artist in compact typed arrays. Node ids
+    # are assigned in order of first appearance, the ends of every artist are
+    # recorded so the graph can be cut off after the first max_nodes artists.
+
+    def __init__(self):
+        self.ids = {}
+        self.src = array("q")
+        self.dst = array("q")
+        self.weights = array("f")
+        self.edge_ends = array("q")
+        self.node_ends = array("q")
+
+
+    @property
+    def n_artists(self):
+        return len(self.edge_ends)
+
+
+    def add(self, artist, similar_artists):
+        artist_id = self.ids.setdefault(artist, len(self.ids))
+        for similar_artist, weight in similar_artists.items():
+            self.src.append(artist_id)
+            self.dst.append(self.ids.setdefault(similar_artist, len(self.ids)))
+            self.weights.append(weight)
+        self.edge_ends.append(len(self.src))
+        self.node_ends.append(len(self.ids))
+
+
+    def to_csr(self, max_nodes=None):
+        n_edges = len(self.src)
+        n_nodes = len(self.ids)
+        if max_nodes and max_nodes < self.n_artists:
+            n_edges = self.edge_ends[max_nodes - 1]
+            n_nodes = self.node_ends[max_nodes - 1]
+
+        nodes = list(self.ids)[:n_nodes]
+        return CSRGraph.from_edges(
+            nodes,
+            np.frombuffer(self.src, dtype=np.int64, count=n_edges),
+            np.frombuffer(self.dst, dtype=np.int64, count=n_edges),
+            np.frombuffer(self.weights, dtype=np.float32, count=n_edges)
+        )
+
+
+class CSRGraph:
+    # Undirected weighted graph as an integer node table plus a symmetric
+    # scipy CSR adjacency matrix. Row i belongs to nodes[i].
+
+    def __init__(self, nodes, adjacency):
+        self.nodes = nodes
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.adjacency = adjacency.tocsr()
+        self.adjacency.sort_indices()
+
+
+    @classmethod
+    def from_similar_artists(cls, similar_artists_dict, max_nodes=None):
+        edges = SimilarEdges()
+        for artist, data in tqdm.tqdm(similar_artists_dict.items()):
+            if max_nodes and edges.n_artists >= max_nodes:
+                break
+            edges.add(artist, data["similar_artists"])
+        return edges.to_csr()
+
+
+    @classmethod
+    def from_edges(cls, nodes, src, dst, weights):
+        n = len(nodes)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+
+        # An undirected edge can be listed from both sides. Like repeated
+        # networkx add_edge calls, the last weight seen wins.
+        u = np.minimum(src, dst)
+        v = np.maximum(src, dst)
+        _, last = np.unique((u * n + v)[::-1], return_index=True)
+        keep = len(u) - 1 - last
+        u, v, weights = u[keep], v[keep], weights[keep]
+
+        off_diagonal = u != v
+        rows = np.concatenate([u, v[off_diagonal]])
+        cols = np.concatenate([v, u[off_diagonal]])
+        data = np.concatenate([weights, weights[off_diagonal]])
+
+        adjacency = sp.csr_matrix((data, (rows, cols)), shape=(n, n), dtype=np.float32)
+        return cls(list(nodes), adjacency)
+
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+
+    def number_of_edges(self):
+        return int((self.adjacency.nnz + self.adjacency.diagonal().astype(bool).sum()) // 2)
+
+
+    def degrees(self):
+        return np.diff(self.adjacency.indptr)
+
+
+    def to_networkx(self):
+        import networkx as nx
+
+        upper = sp.triu(self.adjacency).tocoo()
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_weighted_edges_from(
+            (self.nodes[u], self.nodes[v], float(w)) for u, v, w in zip(upper.row, upper.col, upper.data)
+        )
+        return graph
+
+
+    def save(self, cache_dir):
+        cache_dir = Path(cache_dir)
+        sp.save_npz(cache_dir / "graph_csr.npz", self.adjacency)
+        with open(cache_dir / "graph_nodes.json", "w", encoding="utf-8") as f:
+            json.dump(self.nodes, f, ensure_ascii=False)
+
+
+    @classmethod
+    def load(cls, cache_dir):
+        cache_dir = Path(cache_dir)
+        with open(cache_dir / "graph_nodes.json", "r", encoding="utf-8") as f:
+            nodes = json.load(f)
+        return cls(nodes, sp.load_npz(cache_dir / "graph_csr.npz"))
+
 
 class Graph:
-    def __init__(self, cache_dir="data/cache/", regen=False):
+    def __init__(self, cache_dir="data/cache/", regen=False, build=True):
+        # build=False leaves loading to the caller: load_dict_file() and
+        # build_graph(), or load_graph() for the graph of an earlier run.
         self.cache_dir = Path(cache_dir)
         self.regen = regen
-        self.graph = nx.Graph()
-        self.load_dict_file()
-        self.build_graph()
+        self.csr = None
+        self._nx_graph = None
+        self.artists_file = None
+        self.edges = None
+        self._similar_artists_dict = None
+        if build:
+            self.load_dict_file()
+            self.build_graph()
+
+
+    @property
+    def graph(self):
+        # networkx view of the CSR graph, only built when something asks for it.
+        if self._nx_graph is None and self.csr is not None:
+            self._nx_graph = self.csr.to_networkx()
+        return self._nx_graph
 
 
+    @property
+    def similar_artists_dict(self):
+        # The fully parsed artists_tags.json, only loaded when something asks
+        # for it. The pipeline itself streams the file in load_dict_file().
+        if self._similar_artists_dict is None:
+            with open(self.cache_dir / "artists_tags.json", "r", encoding="utf-8") as f:
+                self._similar_artists_dict = json.load(f)
+        return self._similar_artists_dict
+
+
+    @instrumented("load", items=lambda self: len(self.artists_file or []))
     def load_dict_file(self):
+        # Streams artists_tags.json: only the similar artists are kept, as a
+        # compact edge list. Bios, tags and links stay on disk and are read
+        # per artist through self.artists_file.
         cache_file = self.cache_dir / "artists_tags.json"
 
         if not os.path.exists(cache_file) and not self.regen:
             print(f"Cache file {cache_file} does not exist. Please create it first.")
             return
-        
-        with open(cache_file, "r", encoding="utf-8") as f:
-            self.similar_artists_dict = json.load(f)
+
+        self.artists_file = ArtistsFile(cache_file)
+        self.edges = SimilarEdges()
+        for artist, entry in tqdm.tqdm(self.artists_file.iter_entries()):
+            self.edges.add(artist, entry.get("similar_artists", {}))
+        self.artists_file.save_index(self.cache_dir / "artists_index.json")
         print(f"Loaded similar artists dict file from {cache_file}.")
 
-        return self.similar_artists_dict
+        return self.edges
 
 
+    @instrumented("graph", items=lambda self: self.csr.number_of_nodes())
     def build_graph(self, max_nodes=None):
         print("Building graph from similar artists dict...")
 
-        i = 0
         if max_nodes:
             print(f"Limiting to first {max_nodes} artists.")
-        for artist, data in tqdm.tqdm(self.similar_artists_dict.items()):
-            if max_nodes and i >= max_nodes:
-                break
-            i += 1
-            for similar_artist, weight in data["similar_artists"].items():
-                self.graph.add_edge(artist, similar_artist, weight=weight)
-        print("Graph built.")
-        return self.graph
+        self.csr = self.edges.to_csr(max_nodes)
+        self._nx_graph = None
+        self.csr.save(self.cache_dir)
+        print(f"Graph built: {self.csr.number_of_nodes()} nodes, {self.csr.number_of_edges()} edges.")
+        return self.csr
+
+
+    def load_graph(self):
+        # The graph saved by build_graph() and the entry offsets saved by
+        # load_dict_file(), without parsing artists_tags.json again.
+        self.csr = CSRGraph.load(self.cache_dir)
+        self._nx_graph = None
+
+        self.artists_file = ArtistsFile(self.cache_dir / "artists_tags.json")
+        index_file = self.cache_dir / "artists_index.json"
+        if not self.artists_file.load_index(index_file):
+            print(f"Indexing {self.artists_file.path}...")
+            self.artists_file.build_index()
+            self.artists_file.save_index(index_file)
+        print(f"Loaded graph from {self.cache_dir}: {self.csr.number_of_nodes()} nodes.")
+        return self.csr
 
 
     def visualize_2d_graph(self):
+        import networkx as nx
+        import matplotlib.pyplot as plt
+
         pos = nx.spring_layout(self.graph, k=0.15, seed=42)
 
         weights = [self.graph[u][v]["weight"] for u, v in self.graph.edges()]
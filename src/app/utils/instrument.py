@@ -0,0 +1,197 @@
+import cProfile
+import functools
+import json
+import os
+import platform
+import pstats
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def current_rss():
+    # Resident set size in bytes (Linux), None where /proc is not available.
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class PeakRSS:
+    # Samples the resident set size in a background thread while a stage
+    # runs, as the process-wide peak (ru_maxrss) never goes down.
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss() or 0)
+            self._stop.wait(self.interval)
+
+
+    def __enter__(self):
+        self.peak = current_rss() or 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss() or 0)
+
+
+class RunReport:
+    # Structured record of one pipeline run: time, peak RSS and throughput of
+    # every stage, plus counters (API requests, retries, cache hits) grouped
+    # by endpoint. Stages named in profile are run under cProfile, stages in
+    # trace_memory under tracemalloc.
+
+    def __init__(self, profile=(), trace_memory=(), profile_dir="data/reports"):
+        self.profile = set(profile)
+        self.trace_memory = set(trace_memory)
+        self.profile_dir = Path(profile_dir)
+        self.started = time.time()
+        self.stages = []
+        self.counters = {}
+        self.sections = {}
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def stage(self, name, items=None):
+        # The yielded record can be updated inside the block, e.g. to set
+        # "items" once the amount of processed items is known.
+        record = {"stage": name, "items": items}
+
+        profiler = cProfile.Profile() if name in self.profile else None
+        tracing = name in self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+
+        with PeakRSS() as memory:
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                yield record
+            finally:
+                if profiler:
+                    profiler.disable()
+                elapsed = time.perf_counter() - start
+
+        record["seconds"] = round(elapsed, 4)
+        record["peak_rss_mb"] = round(memory.peak / 2**20, 1)
+        if record["items"]:
+            record["items_per_second"] = round(record["items"] / elapsed, 1) if elapsed > 0 else None
+
+        if profiler:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_file = self.profile_dir / f"{name}.prof"
+            profiler.dump_stats(profile_file)
+            record["profile"] = str(profile_file)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+        if tracing:
+            _, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            record["traced_peak_mb"] = round(peak / 2**20, 1)
+            record["top_allocations"] = [
+                {"line": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in top
+            ]
+
+        with self.lock:
+            self.stages.append(record)
+
+
+    def count(self, group, key, value=1):
+        with self.lock:
+            counters = self.counters.setdefault(group, {})
+            counters[key] = counters.get(key, 0) + value
+
+
+    def add_section(self, name, data):
+        with self.lock:
+            self.sections[name] = data
+
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": round(time.time() - self.started, 3),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "stages": list(self.stages),
+                "counters": {group: dict(counters) for group, counters in self.counters.items()},
+                **self.sections,
+            }
+
+
+    def write(self, report_file):
+        report_file = Path(report_file)
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_file, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Run report written to {report_file}.")
+        return report_file
+
+
+    def print_summary(self):
+        with self.lock:
+            stages = list(self.stages)
+        print("Stage timings:")
+        for record in stages:
+            rate = f"  {record['items_per_second']:>10.1f}/s" if record.get("items_per_second") else ""
+            print(f"* {record['stage']:<10} {record['seconds']:>9.2f}s  {record['peak_rss_mb']:>8.1f} MB{rate}")
+
+
+_report = RunReport()
+
+
+def current_report():
+    return _report
+
+
+def set_report(report):
+    # Makes report the target of stage(), instrumented() and count().
+    global _report
+    _report = report
+    return report
+
+
+def stage(name, items=None):
+    return _report.stage(name, items=items)
+
+
+def count(group, key, value=1):
+    _report.count(group, key, value)
+
+
+def instrumented(name, items=None):
+    # Method decorator: runs the method as a stage of the current report.
+    # items(self) gives the number of processed items after the call.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with stage(name) as record:
+                result = func(self, *args, **kwargs)
+                if items:
+                    record["items"] = items(self)
+            return result
+        return wrapper
+    return decorator
@@ -3,204 +3,267 @@ import json
 import os
 from pathlib import Path
 import tqdm
-import time
 
 from typing import List
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.cache import open_cache
+from utils.checkpoint import EnrichmentStore, source_hash
+from utils.client import HTTPClient
+from utils.instrument import count, current_report, instrumented
+from utils.ratelimit import RateLimiter
+from utils.wikidata import WikidataLinks, empty_links
+
+
+class LastFMError(Exception):
+    pass
 
 
 class LastFM:
 
     BASE_URL = "https://ws.audioscrobbler.com/2.0/"
 
-
-    def __init__(self, api_key=None, regen=False, top_limit=1000, depth=3, similar_limit=5, cache_dir="data/cache"):
+    # Last.fm error codes that are temporary: operation failed, service
+    # offline, temporarily unavailable and rate limit exceeded.
+    TRANSIENT_ERRORS = {8, 11, 16, 29}
+
+
+    def __init__(
+        self,
+        api_key=None,
+        regen=False,
+        top_limit=1000,
+        depth=3,
+        similar_limit=5,
+        cache_dir="data/cache",
+        workers=1,
+        rate_limit=5.0,
+        base_url=None,
+        cache_backend="json",
+        stages=("crawl", "enrich"),
+        recrawl=False
+        ):
+        # stages: "crawl" fills the similar artists cache, "enrich" writes
+        # artists_tags.json from it. An existing cache is only crawled again
+        # with recrawl=True, which keeps the cached artists and fetches the
+        # ones it does not have yet (e.g. after raising depth or top_limit),
+        # or with regen=True, which fetches all of them again.
         self.api_key = api_key or os.environ.get("LASTFM_API_KEY")
+        self.base_url = base_url or self.BASE_URL
         self.regen = regen
         if not self.api_key:
             raise ValueError("LASTFM_API_KEY not set")
         
         self.top_limit = top_limit
         self.depth = depth
-        self.similar_limit = 5
+        self.similar_limit = similar_limit
+        self.recrawl = recrawl
         self.cache_dir = Path(cache_dir)
-        self.top_artists_cache = self.cache_dir / "top_artists"
-        self.similar_artists_cache = self.cache_dir / "similar_artists"
+        self.cache = open_cache(cache_backend, self.cache_dir)
+        self.workers = max(1, workers)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.http = HTTPClient(pool_size=self.workers)
+        self.wikidata = WikidataLinks(self.http, self.cache_dir / "wikidata_links.json")
         self.similar_artists_dict = {}
+        self.source_hashes = {}
         self.all_tags = {}
-        self.create_similar_artists_cache()
-        self.create_dict_file()
+        self.store = None
+        if "crawl" in stages:
+            self.create_similar_artists_cache()
+        if "enrich" in stages:
+            self.create_dict_file()
 
 
     def _init_cache_dirs(self):
-        self.top_artists_cache.mkdir(parents=True, exist_ok=True)
-        self.similar_artists_cache.mkdir(parents=True, exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache.init()
 
 
-    def _request(self, params):
+    def _request(self, params, strict=False):
+        # Returns {} for Last.fm error payloads (e.g. an unknown artist). A
+        # failed request (no connection, still 429 or 5xx after all retries,
+        # no valid JSON) also gives {}, unless strict is set: then it raises
+        # LastFMError, so enrichment results are only stored for requests that
+        # actually got an answer.
         params = {
             **params,
             "api_key": self.api_key,
             "format": "json",
         }
-        
-        response = requests.get(self.BASE_URL, params=params)
-        
-        for i in range(3):
-            try:
-                data = response.json()
-                continue
-            except requests.exceptions.RequestException as e:
-                print(e)
-                time.sleep(0.5)
-                print("Trying again...")
-                data = {}
+
+        try:
+            data = self._get_json(params)
+        except LastFMError as e:
+            if strict:
+                raise
+            print(e)
+            return {}
+
+        if not isinstance(data, dict):
+            return {}
 
         if "error" in data:
+            if strict and data["error"] in self.TRANSIENT_ERRORS:
+                raise LastFMError(f"Last.fm request {params.get('method')} failed: {data.get('message')} (error {data['error']}).")
             return {}
 
         return data
 
 
-    def create_dict(self):
-        similar_artists_cache_dir = self.cache_dir / "similar_artists"
+    def _get_json(self, params):
+        method = params.get("method")
+        try:
+            response = self.http.get(
+                self.base_url,
+                params=params,
+                rate_limiter=self.rate_limiter,
+                endpoint=method
+            )
+        except requests.RequestException as e:
+            raise LastFMError(f"Last.fm request {method} failed: {e}") from e
 
-        print(f"Creating dict of all artists...")
-        for file in tqdm.tqdm(list(similar_artists_cache_dir.glob("*.json"))):
-            dict_entry = {}
+        if response.status_code in HTTPClient.RETRY_STATUS:
+            raise LastFMError(f"Last.fm request {method} failed: HTTP {response.status_code} after {self.http.max_retries} retries.")
 
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                artist_name = file.stem.replace('_', '/')
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LastFMError(f"Last.fm request {method} returned invalid JSON (HTTP {response.status_code}).") from e
 
-                for similar in data:
-                    dict_entry[similar.get("name")] = float(similar.get("match", 0))
 
-                self.similar_artists_dict[artist_name] = {
-                    "similar_artists": dict_entry,
-                    "tags": [],
-                    "bio": "",
-                    "links": {}
-                }
+    @instrumented("dict", items=lambda self: len(self.similar_artists_dict))
+    def create_dict(self):
+        print(f"Creating dict of all artists...")
+        for artist_name, data in self.cache.iter_similar():
+            dict_entry = {}
 
+            for similar in data:
+                dict_entry[similar.get("name")] = float(similar.get("match", 0))
 
-    def add_tags(self):
-        all_artist_names = list(self.similar_artists_dict.keys())
+            self.similar_artists_dict[artist_name] = {
+                "similar_artists": dict_entry,
+                "tags": [],
+                "bio": "",
+                "links": {}
+            }
+            self.source_hashes[artist_name] = source_hash(data)
 
-        print(f"Adding tags to {len(self.similar_artists_dict)} artists...")
-        for i in tqdm.tqdm(range(0, len(all_artist_names))):
-            artist_name = all_artist_names[i]
-            data = self._request({
-            "method": "artist.gettoptags",
-            "artist": artist_name,
-            "autocorrect": 1,
-            })
-
-            tags = data.get("toptags", {}).get("tag", [])
-
-            tags_data = {}
-
-            for tag in tags:
-                name = tag.get("name").lower()
-                pop = tag.get("count")
-                if name not in self.all_tags:
-                    self.all_tags[name] = pop
-                else:
-                    self.all_tags[name] += pop
-                tags_data[name] = pop
-            
-            self.similar_artists_dict[artist_name]["tags"] = tags_data
-            
-            time.sleep(0.5)
-        
-        cache_file = self.cache_dir / "all_tags.json"
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(self.all_tags, f, indent=2)
-        print(f"Created all tags file at {cache_file}.")
 
+    def _fetch_tags(self, artist_name):
+        data = self._request({
+        "method": "artist.gettoptags",
+        "artist": artist_name,
+        "autocorrect": 1,
+        }, strict=True)
 
-    def add_artist_info(self):
-        all_artist_names = list(self.similar_artists_dict.keys())
+        tags = data.get("toptags", {}).get("tag", [])
 
-        print(f"Adding artist info to {len(self.similar_artists_dict)} artists...")
-        for i in tqdm.tqdm(range(0, len(all_artist_names))):
-            artist_name = all_artist_names[i]
-            data = self._request({
-            "method": "artist.getinfo",
-            "artist": artist_name,
-            "autocorrect": 1,
-            })
+        tags_data = {}
 
-            bio = data.get("artist", {}).get("bio", {}).get("summary")
-            mbid = data.get("artist", {}).get("mbid")
-            links = self.get_artist_links_from_mbid(mbid) if mbid else {
-                "spotify": None,
-                "youtube": None,
-                "apple_music": None
-                }
+        for tag in tags:
+            name = tag.get("name", "").lower()
+            if name:
+                tags_data[name] = tag.get("count", 0)
 
-            self.similar_artists_dict[artist_name]["links"] = links
+        return {"tags": tags_data}
 
-            self.similar_artists_dict[artist_name]["bio"] = bio
 
-        time.sleep(0.5)
+    def _fetch_info(self, artist_name):
+        data = self._request({
+        "method": "artist.getinfo",
+        "artist": artist_name,
+        "autocorrect": 1,
+        }, strict=True)
 
+        bio = data.get("artist", {}).get("bio", {}).get("summary")
+        mbid = data.get("artist", {}).get("mbid")
 
-    def get_artist_links_from_mbid(self, mbid):
+        return {
+            "bio": bio,
+            "mbid": mbid.lower() if mbid else None
+        }
 
-        time.sleep(3)
 
-        url = "https://query.wikidata.org/sparql"
+    def enrich_artists(self, stages=("info", "tags")):
+        # Single pass over all artists: the getinfo and gettoptags calls of an
+        # artist are queued next to each other on one worker pool, and the
+        # shared rate limiter in _request keeps the pool within the quota.
+        fetchers = {"info": self._fetch_info, "tags": self._fetch_tags}
+        pending = {stage: set(self.store.pending(stage, self.source_hashes)) for stage in stages}
+        jobs = [
+            (artist_name, stage)
+            for artist_name in self.source_hashes
+            for stage in stages
+            if artist_name in pending[stage]
+        ]
+
+        n_artists = len(set.union(set(), *pending.values()))
+        print(f"Enriching {n_artists} artists ({len(self.source_hashes) - n_artists} up to date)...")
+        for stage_name in stages:
+            count("enrichment", f"{stage_name}_up_to_date", len(self.source_hashes) - len(pending[stage_name]))
+
+        # Results are only written from this thread, workers never touch the store.
+        failed = 0
+        with current_report().stage("enrich", items=len(jobs)), ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(fetchers[stage], artist_name): (artist_name, stage)
+                for artist_name, stage in jobs
+            }
+            for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+                artist_name, stage = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Not stored, the artist stays pending for the next run.
+                    print(f"Fetching {stage} for {artist_name} failed: {e}")
+                    count("enrichment", f"{stage}_failed")
+                    failed += 1
+                    continue
+                self.store.put(artist_name, stage, self.source_hashes[artist_name], result)
+
+        if failed:
+            print(f"{failed} requests failed, these artists are fetched again by the next enrichment run.")
+        return failed
 
-        query = f"""
-        SELECT ?spotifyId ?youtubeId ?appleMusicId WHERE {{
-        ?artist wdt:P434 "{mbid}" .
-        OPTIONAL {{ ?artist wdt:P1902 ?spotifyId . }}
-        OPTIONAL {{ ?artist wdt:P2397 ?youtubeId . }}
-        OPTIONAL {{ ?artist wdt:P2850 ?appleMusicId . }}
-        }}
-        """
 
-        headers = {
-            "Accept": "application/sparql-results+json"
-        }
-        response = requests.get(url, params={"query": query}, headers=headers)
+    def add_tags(self):
+        self.enrich_artists(stages=("tags",))
 
-        links = {
-            "spotify": None,
-            "youtube": None,
-            "apple_music": None
-        }
 
-        try:
-            response = requests.get(
-                url,
-                params={"query": query},
-                headers=headers,
-                timeout=5
-            )
-            data = response.json()
+    def add_artist_info(self):
+        self.enrich_artists(stages=("info",))
 
-            bindings = data.get("results", {}).get("bindings", [])
-            if not bindings:
-                return links
 
-            b = bindings[0]
+    @instrumented("apply", items=lambda self: len(self.similar_artists_dict))
+    def apply_enrichment(self):
+        info = self.store.get_stage("info")
+        tags = self.store.get_stage("tags")
 
-            if "spotifyId" in b:
-                links["spotify"] = f"https://open.spotify.com/artist/{b['spotifyId']['value']}"
+        links = self.wikidata.resolve(
+            info[name]["mbid"] for name in self.similar_artists_dict if name in info
+        )
 
-            if "youtubeId" in b:
-                links["youtube"] = f"https://www.youtube.com/channel/{b['youtubeId']['value']}"
+        self.all_tags = {}
+        for artist_name, entry in self.similar_artists_dict.items():
+            artist_info = info.get(artist_name, {})
+            mbid = artist_info.get("mbid")
+            entry["bio"] = artist_info.get("bio")
+            entry["links"] = links[mbid] if mbid else empty_links()
 
-            if "appleMusicId" in b:
-                links["apple_music"] = f"https://music.apple.com/artist/{b['appleMusicId']['value']}"
+            tags_data = tags.get(artist_name, {}).get("tags", {})
+            for name, pop in tags_data.items():
+                self.all_tags[name] = self.all_tags.get(name, 0) + pop
+            entry["tags"] = tags_data
 
-            return links
+        cache_file = self.cache_dir / "all_tags.json"
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(self.all_tags, f, indent=2)
+        print(f"Created all tags file at {cache_file}.")
 
-        except requests.RequestException as e:
-            print(f"Wikidata query failed for MBID {mbid}: {e}")
-            return links
+
+    def get_artist_links_from_mbid(self, mbid):
+        return self.wikidata.resolve([mbid]).get(mbid.lower(), empty_links())
 
 
     def create_dict_file(self):
@@ -209,22 +272,42 @@ class LastFM:
         if os.path.exists(cache_file) and not self.regen:
             print(f"Cache file {cache_file} already exists. Skipping creation.")
             return
-        
-        self.create_dict()
-        self.add_artist_info()
-        self.add_tags()
 
-        with open(cache_file, "w", encoding="utf-8") as f:
+        # Results are checkpointed per artist, an interrupted run resumes
+        # where it stopped.
+        self.store = EnrichmentStore(self.cache_dir / "enrichment.sqlite")
+        try:
+            self.create_dict()
+            self.enrich_artists()
+            self.apply_enrichment()
+        finally:
+            self.store.close()
+
+        tmp_file = self.cache_dir / "artists_tags.json.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
             json.dump(self.similar_artists_dict, f, indent=2)
+        os.replace(tmp_file, cache_file)
         print(f"Created similar artists dict file at {cache_file}.")
 
+        self.print_http_stats()
+
+
+    def print_http_stats(self):
+        stats = self.http.summary()
+        current_report().add_section("http", stats)
+        print(
+            f"HTTP requests: {stats['requests']}, retries: {stats['retries']}, "
+            f"failures: {stats['failures']}, mean latency: {stats['mean_latency'] * 1000:.1f} ms"
+        )
+
 
     def get_similar_artists(self, artist_name, limit=5):
-        cache_file = self.similar_artists_cache / f"{artist_name.replace('/', '_')}.json"
+        cached = self.cache.get_similar(artist_name)
 
-        if cache_file.exists():
-            with open(cache_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+        if cached is not None and not self.regen:
+            count("artist.getsimilar", "cache_hits")
+            return cached
+        count("artist.getsimilar", "cache_misses")
 
         data = self._request({
             "method": "artist.getsimilar",
@@ -236,21 +319,18 @@ class LastFM:
         artists = data.get("similarartists", {}).get("artist", [])
 
         if artists:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(artists, f, ensure_ascii=False, indent=2)
-
-            time.sleep(0.5)
+            self.cache.put_similar(artist_name, artists)
 
         return artists
 
 
     def get_top_artists(self, limit=500):
-        json_cache = self.top_artists_cache / f"top_artists_{limit}.json"
-        txt_cache = self.top_artists_cache / f"top_artists_{limit}.txt"
+        cached = self.cache.get_top(limit)
 
-        if json_cache.exists() and txt_cache.exists() and not self.regen:
-            with open(json_cache, "r", encoding="utf-8") as f:
-                return json.load(f)
+        if cached is not None and not self.regen:
+            count("chart.gettopartists", "cache_hits")
+            return cached
+        count("chart.gettopartists", "cache_misses")
 
         data = self._request({
             "method": "chart.gettopartists",
@@ -260,50 +340,88 @@ class LastFM:
         artists = data.get("artists", {}).get("artist", [])
 
         if artists:
-            with open(json_cache, "w", encoding="utf-8") as f:
-                json.dump(artists, f, ensure_ascii=False, indent=2)
-
-            with open(txt_cache, "w", encoding="utf-8") as f:
-                for artist in artists:
-                    f.write(artist.get("name", "") + "\n")
-        
-        time.sleep(0.5)
+            self.cache.put_top(limit, artists)
 
         return artists
 
 
     def create_similar_artists_cache(self):
-        if os.path.exists(self.similar_artists_cache):
-            print(f"Cache directory already exists. Skipping creation.")
+        if self.cache.exists() and not (self.recrawl or self.regen):
+            print(f"Similar artists cache already exists. Skipping creation.")
             return
         self._init_cache_dirs()
 
         top_artists = self.get_top_artists(limit=self.top_limit)
 
+        print("Creating similar artists cache...")
+
+        with current_report().stage("crawl") as record:
+            if self.workers > 1:
+                record["items"] = self._crawl_concurrent(top_artists)
+            else:
+                record["items"] = self._crawl_sequential(top_artists)
+
+        self.print_http_stats()
+
+
+    def _crawl_sequential(self, top_artists):
         visited = set()
         queue = deque()
 
         for artist in top_artists:
             name = artist.get("name")
-            if name:
+            if name and name not in visited:
+                visited.add(name)
                 queue.append((name, 0))
 
-        print("Creating similar artists cache...")
-
         while queue:
             artist_name, level = queue.popleft()
 
             if level >= self.depth:
                 continue
 
-            if artist_name in visited:
-                continue
-
-            visited.add(artist_name)
-
             similar_artists = self.get_similar_artists(artist_name, limit=self.similar_limit)
 
             for sim_artist in similar_artists:
                 sim_name = sim_artist.get("name")
                 if sim_name and sim_name not in visited:
+                    visited.add(sim_name)
                     queue.append((sim_name, level + 1))
+
+        return len(visited)
+
+
+    def _crawl_concurrent(self, top_artists):
+        # Level-synchronous BFS: every artist of a level is fetched by the worker
+        # pool before moving on, so each artist is expanded at its lowest level
+        # and the resulting cache matches the sequential crawl.
+        visited = set()
+        frontier = []
+
+        for artist in top_artists:
+            name = artist.get("name")
+            if name and name not in visited:
+                visited.add(name)
+                frontier.append(name)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for level in range(self.depth):
+                if not frontier:
+                    break
+
+                next_frontier = []
+                results = executor.map(
+                    lambda name: self.get_similar_artists(name, limit=self.similar_limit),
+                    frontier
+                )
+
+                for similar_artists in tqdm.tqdm(results, total=len(frontier), desc=f"Depth {level + 1}"):
+                    for sim_artist in similar_artists:
+                        sim_name = sim_artist.get("name")
+                        if sim_name and sim_name not in visited:
+                            visited.add(sim_name)
+                            next_frontier.append(sim_name)
+
+                frontier = next_frontier
+
+        return len(visited)
@@ -0,0 +1,198 @@
+import numpy as np
+
+from abc import ABC, abstractmethod
+from scipy.spatial import cKDTree
+
+
+class LayoutStage(ABC):
+    # One step of a galaxy layout: takes an (n, 3) position array and returns
+    # a new one. Stages never modify their input.
+
+    @abstractmethod
+    def __call__(self, X):
+        pass
+
+
+    def __repr__(self):
+        params = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"{type(self).__name__}({params})"
+
+
+class Center(LayoutStage):
+    # Moves the given center (default: the mean position) to the origin.
+    def __init__(self, center=None):
+        self.center = None if center is None else np.asarray(center, dtype=np.float64)
+
+
+    def __call__(self, X):
+        return X - (self.center if self.center is not None else X.mean(axis=0))
+
+
+class Scale(LayoutStage):
+    # Scales every axis, e.g. Scale((1, 1, 0.3)) flattens the disc.
+    def __init__(self, factors=(1.0, 1.0, 1.0)):
+        self.factors = tuple(factors)
+
+
+    def __call__(self, X):
+        return X * np.asarray(self.factors, dtype=np.float64)
+
+
+class SpiralArms(LayoutStage):
+    # Rotates every point around the z axis by strength * r. With arms > 0 the
+    # points are also pulled towards the nearest of `arms` evenly spaced
+    # spiral arms, pull=1 puts them exactly on an arm.
+    def __init__(self, strength=1.5, arms=0, pull=0.5):
+        self.strength = strength
+        self.arms = arms
+        self.pull = pull
+
+
+    def __call__(self, X):
+        x, y = X[:, 0], X[:, 1]
+        r = np.sqrt(x**2 + y**2)
+        theta = np.arctan2(y, x) + self.strength * r
+
+        if self.arms > 0:
+            arm_width = 2 * np.pi / self.arms
+            offset = (theta - self.strength * r) / arm_width
+            theta -= self.pull * (offset - np.round(offset)) * arm_width
+
+        out = X.copy()
+        out[:, 0] = r * np.cos(theta)
+        out[:, 1] = r * np.sin(theta)
+        return out
+
+
+class RadialDensity(LayoutStage):
+    # Redistributes the distances to the z axis by rank, keeping the angles:
+    # the point at quantile u ends at radius * u**exponent. exponent=0.5 gives
+    # an evenly filled disc, lower values a denser bulge.
+    def __init__(self, exponent=0.5, radius=None):
+        self.exponent = exponent
+        self.radius = radius
+
+
+    def __call__(self, X):
+        r = np.sqrt(X[:, 0]**2 + X[:, 1]**2)
+        if len(r) < 2:
+            return X.copy()
+
+        quantiles = np.empty(len(r))
+        quantiles[np.argsort(r, kind="stable")] = np.linspace(0.0, 1.0, len(r))
+        target = (self.radius or r.max()) * quantiles**self.exponent
+
+        factor = np.divide(target, r, out=np.zeros_like(r), where=r > 0)
+        out = X.copy()
+        out[:, 0] *= factor
+        out[:, 1] *= factor
+        return out
+
+
+def relax_overlaps(X, min_distance, iterations=5, step=0.5):
+    # Pushes apart every pair of points closer than min_distance, pairs are
+    # found with a KD-tree. Each pass moves both points of a pair by step
+    # times half their overlap, along the line between them.
+    X = np.array(X, dtype=np.float64)
+    for _ in range(iterations):
+        pairs = cKDTree(X).query_pairs(min_distance, output_type="ndarray")
+        if len(pairs) == 0:
+            break
+
+        i, j = pairs[:, 0], pairs[:, 1]
+        delta = X[i] - X[j]
+        dist = np.linalg.norm(delta, axis=1)
+
+        # Coinciding points get a fixed direction.
+        delta[dist == 0] = (1.0, 0.0, 0.0)
+        dist[dist == 0] = 1.0
+        push = delta / dist[:, None] * (step * (min_distance - dist) / 2)[:, None]
+
+        shift = np.zeros_like(X)
+        np.add.at(shift, i, push)
+        np.add.at(shift, j, -push)
+        X += shift
+    return X
+
+
+class Relax(LayoutStage):
+    def __init__(self, min_distance=0.01, iterations=5, step=0.5):
+        self.min_distance = min_distance
+        self.iterations = iterations
+        self.step = step
+
+
+    def __call__(self, X):
+        return relax_overlaps(X, self.min_distance, iterations=self.iterations, step=self.step)
+
+
+class LayoutPipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+
+    def __call__(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        for stage in self.stages:
+            X = stage(X)
+        return X
+
+
+    def __repr__(self):
+        return f"LayoutPipeline({self.stages!r})"
+
+
+    @classmethod
+    def from_spec(cls, spec):
+        # spec: list of {"stage": <name>, **params}, e.g. read from JSON.
+        stages = []
+        for entry in spec:
+            params = dict(entry)
+            name = params.pop("stage")
+            if name not in LAYOUT_STAGES:
+                raise ValueError(f"Unknown layout stage {name!r}, expected one of {sorted(LAYOUT_STAGES)}")
+            stages.append(LAYOUT_STAGES[name](**params))
+        return cls(stages)
+
+
+LAYOUT_STAGES = {
+    "center": Center,
+    "scale": Scale,
+    "spiral": SpiralArms,
+    "radial": RadialDensity,
+    "relax": Relax,
+}
+
+
+def spiral_pipeline(spiral_strength=1.5, z_scale=0.3, center=None):
+    # The original spiral_warp: flatten, twist, flatten again.
+    return LayoutPipeline([
+        Center(center),
+        Scale((1.0, 1.0, z_scale)),
+        SpiralArms(spiral_strength),
+        Scale((1.0, 1.0, z_scale)),
+    ])
+
+
+LAYOUT_PRESETS = {
+    "classic": [
+        {"stage": "center"},
+        {"stage": "scale", "factors": [1.0, 1.0, 0.3]},
+        {"stage": "spiral", "strength": 1.5},
+        {"stage": "scale", "factors": [1.0, 1.0, 0.3]},
+    ],
+    "two_arms": [
+        {"stage": "center"},
+        {"stage": "scale", "factors": [1.0, 1.0, 0.09]},
+        {"stage": "radial", "exponent": 0.5},
+        {"stage": "spiral", "strength": 1.5, "arms": 2, "pull": 0.6},
+        {"stage": "relax", "min_distance": 0.01},
+    ],
+    "four_arms_bulge": [
+        {"stage": "center"},
+        {"stage": "scale", "factors": [1.0, 1.0, 0.09]},
+        {"stage": "radial", "exponent": 0.8},
+        {"stage": "spiral", "strength": 2.0, "arms": 4, "pull": 0.5},
+        {"stage": "relax", "min_distance": 0.01},
+    ],
+}
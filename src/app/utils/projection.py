@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class ChunkedPCA:
+    # PCA that only reads the data in chunks of rows, so a memory-mapped
+    # embedding matrix is never copied as a whole.
+    #  - method="covariance": one pass accumulating the mean and the d x d
+    #    covariance, then an eigendecomposition. Exact, cheap for small d.
+    #  - method="incremental": scikit-learn's IncrementalPCA fed chunk by chunk,
+    #    approximate when the leading variances are close.
+
+    def __init__(self, n_components=3, chunk_size=65536, method="covariance"):
+        if method not in ("covariance", "incremental"):
+            raise ValueError(f"Unknown PCA method {method!r}, expected 'covariance' or 'incremental'")
+        self.n_components = n_components
+        self.chunk_size = chunk_size
+        self.method = method
+        self.mean = None
+        self.components = None
+
+
+    @classmethod
+    def from_basis(cls, mean, components):
+        pca = cls(n_components=len(components))
+        pca.mean = np.asarray(mean, dtype=np.float64)
+        pca.components = np.asarray(components, dtype=np.float64)
+        return pca
+
+
+    def _chunks(self, X):
+        for start in range(0, X.shape[0], self.chunk_size):
+            yield np.asarray(X[start:start + self.chunk_size], dtype=np.float64)
+
+
+    def fit(self, X):
+        if self.method == "incremental":
+            from sklearn.decomposition import IncrementalPCA
+
+            ipca = IncrementalPCA(n_components=self.n_components)
+            for chunk in self._chunks(X):
+                # partial_fit needs at least n_components rows per call.
+                if len(chunk) >= self.n_components:
+                    ipca.partial_fit(chunk)
+            self.mean = ipca.mean_
+            self.components = ipca.components_
+            return self
+
+        n, d = X.shape
+        total = np.zeros(d)
+        gram = np.zeros((d, d))
+        for chunk in self._chunks(X):
+            total += chunk.sum(axis=0)
+            gram += chunk.T @ chunk
+
+        self.mean = total / n
+        covariance = gram / n - np.outer(self.mean, self.mean)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        components = eigenvectors[:, np.argsort(eigenvalues)[::-1][:self.n_components]].T
+
+        # Deterministic signs: the largest coefficient of every component is positive.
+        signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+        self.components = components * signs[:, None]
+        return self
+
+
+    def transform(self, X):
+        if self.components is None:
+            raise ValueError("Call fit() first.")
+
+        out = np.empty((X.shape[0], len(self.components)), dtype=np.float64)
+        for i, chunk in enumerate(self._chunks(X)):
+            start = i * self.chunk_size
+            out[start:start + len(chunk)] = (chunk - self.mean) @ self.components.T
+        return out
+
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
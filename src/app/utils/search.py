@@ -0,0 +1,188 @@
+import json
+import re
+import unicodedata
+import numpy as np
+
+from pathlib import Path
+
+
+SEPARATORS = re.compile(r"[\W_]+")
+
+# Upper bound of the artists whose shared trigrams are counted for the typo
+# tolerant results, keeps every keystroke cheap for common trigrams.
+MAX_FUZZY_CANDIDATES = 1000
+
+EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def normalize_query(text):
+    # Same steps as normalizeQuery in docs/scripts/search.js: compatibility
+    # decomposition, accents dropped, lower case, everything that is not a
+    # letter or digit becomes a single space.
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.category(char).startswith("M"))
+    return SEPARATORS.sub(" ", text.lower()).strip()
+
+
+def contains(ranks, candidates):
+    # Which of the candidate ranks are in the sorted rank array.
+    i = np.searchsorted(ranks, candidates)
+    return ranks[np.minimum(i, len(ranks) - 1)] == candidates if len(ranks) else np.zeros(len(candidates), dtype=bool)
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def word_starts(key):
+    # Offsets of every word in a normalized key, so "beat" finds
+    # "The Beatles" and "zep" finds "Led Zeppelin".
+    return [0] + [i + 1 for i, char in enumerate(key) if char == " "]
+
+
+class SearchIndex:
+    # Artist name search without scanning all names. Artists are ranked by
+    # degree (rank 0 is the best connected), all postings hold ranks in
+    # ascending order so the first hits are the most relevant ones.
+    #
+    # Queries up to prefix_length characters are a single lookup in the
+    # prefix table, which holds the top limit artists with a word starting
+    # with that prefix. Longer queries intersect the trigram postings and
+    # check the remaining candidates for the full substring. When that gives
+    # fewer than limit hits, artists sharing most of the trigrams of the query
+    # fill up the list, which catches small typos.
+
+    def __init__(self, names, order, prefixes, postings, prefix_length=4, limit=10):
+        self.names = names
+        self.order = order
+        self.prefixes = prefixes
+        self.postings = postings
+        self.prefix_length = prefix_length
+        self.limit = limit
+        self.keys = [None] * len(names)
+
+
+    @classmethod
+    def build(cls, names, degrees, prefix_length=4, limit=10):
+        order = np.argsort(-np.asarray(degrees), kind="stable").tolist()
+
+        prefixes = {}
+        postings = {}
+        for rank, i in enumerate(order):
+            key = normalize_query(names[i])
+
+            for start in word_starts(key):
+                for length in range(1, prefix_length + 1):
+                    if start + length > len(key):
+                        break
+                    hits = prefixes.setdefault(key[start:start + length], [])
+                    if len(hits) < limit and (not hits or hits[-1] != rank):
+                        hits.append(rank)
+
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(rank)
+
+        postings = {gram: np.asarray(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+        return cls(names, order, prefixes, postings, prefix_length=prefix_length, limit=limit)
+
+
+    def key(self, rank):
+        i = self.order[rank]
+        if self.keys[i] is None:
+            self.keys[i] = normalize_query(self.names[i])
+        return self.keys[i]
+
+
+    def search_ranks(self, query, limit=None):
+        limit = limit or self.limit
+        query = normalize_query(query)
+        if not query:
+            return []
+
+        if len(query) <= self.prefix_length:
+            # At most self.limit hits per prefix, also for a higher limit.
+            return self.prefixes.get(query, [])[:limit]
+
+        grams = trigrams(query)
+        lists = sorted((self.postings.get(gram, EMPTY) for gram in grams), key=len)
+
+        # Only the shortest list is walked, its ranks are looked up in the
+        # others, so common trigrams like "the" are never scanned.
+        candidates = lists[0]
+        for ranks in lists[1:]:
+            candidates = candidates[contains(ranks, candidates)]
+
+        hits = []
+        for rank in candidates.tolist():
+            if query in self.key(rank):
+                hits.append(rank)
+                if len(hits) == limit:
+                    return hits
+
+        # Typo tolerance: at least two thirds of the trigrams in common. Such
+        # an artist is in at least one of the len(grams) - needed + 1 rarest
+        # lists. This is approximate, only the best ranked
+        # MAX_FUZZY_CANDIDATES of those are counted: a badly connected artist
+        # whose trigrams are all common is not found with a typo.
+        needed = -(-2 * len(grams) // 3)
+        candidates = np.unique(np.concatenate(
+            [ranks[:MAX_FUZZY_CANDIDATES] for ranks in lists[:len(lists) - needed + 1]]
+        ))[:MAX_FUZZY_CANDIDATES]
+        counts = sum(contains(ranks, candidates).astype(np.int32) for ranks in lists)
+        shared = dict(zip(candidates.tolist(), counts.tolist()))
+
+        found = set(hits)
+        fuzzy = sorted(
+            (rank for rank, n in shared.items() if n >= needed and rank not in found),
+            key=lambda rank: (-shared[rank], rank)
+        )
+        return hits + fuzzy[:limit - len(hits)]
+
+
+    def search(self, query, limit=None):
+        return [self.names[self.order[rank]] for rank in self.search_ranks(query, limit=limit)]
+
+
+    def to_dict(self):
+        # Trigram postings are delta encoded (ranks are ascending), which
+        # keeps the numbers in the JSON small.
+        return {
+            "prefix_length": self.prefix_length,
+            "limit": self.limit,
+            "order": self.order,
+            "prefixes": self.prefixes,
+            "trigrams": {
+                gram: np.diff(ranks, prepend=0).tolist()
+                for gram, ranks in self.postings.items()
+            },
+        }
+
+
+    @classmethod
+    def from_dict(cls, names, data):
+        postings = {gram: np.cumsum(deltas, dtype=np.int32) for gram, deltas in data["trigrams"].items()}
+        return cls(
+            names,
+            data["order"],
+            data["prefixes"],
+            postings,
+            prefix_length=data["prefix_length"],
+            limit=data["limit"]
+        )
+
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+
+    @classmethod
+    def load(cls, galaxy_dir):
+        # Index of a sharded export (see GalaxyGraph.export_sharded()).
+        galaxy_dir = Path(galaxy_dir)
+        with open(galaxy_dir / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(galaxy_dir / manifest["names"], "r", encoding="utf-8") as f:
+            names = json.load(f)
+        with open(galaxy_dir / manifest["search"], "r", encoding="utf-8") as f:
+            return cls.from_dict(names, json.load(f))
@@ -0,0 +1,140 @@
+import numpy as np
+
+
+def normalize_rows(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def top_k_rows(scores, k):
+    # Top-k per row of a score matrix: argpartition first, then only the k
+    # selected columns are sorted.
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+class SimilarityIndex:
+    # Exact cosine similarity: the embedding matrix is normalized once, a query
+    # is a single matrix-vector (or matrix-matrix for batches) product.
+
+    def __init__(self, embeddings):
+        self.vectors = np.ascontiguousarray(normalize_rows(embeddings))
+
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+
+    def scores(self, queries):
+        # Cosine similarity of normalized queries to every row.
+        return queries @ self.vectors.T
+
+
+    def query(self, vectors, k=10, exclude=None):
+        # vectors: (d,) or (n, d). exclude: row ids (one per query) left out of
+        # the results, used to skip the query node itself.
+        single = np.ndim(vectors) == 1
+        queries = normalize_rows(np.atleast_2d(vectors))
+
+        scores = self.scores(queries)
+        if exclude is not None:
+            scores[np.arange(len(queries)), np.atleast_1d(exclude)] = -np.inf
+
+        idx, top = top_k_rows(scores, k)
+        return (idx[0], top[0]) if single else (idx, top)
+
+
+    def query_ids(self, ids, k=10):
+        ids = np.atleast_1d(ids)
+        return self.query(self.vectors[ids], k=k, exclude=ids)
+
+
+    def all_top_k(self, k=10, max_block_bytes=256 * 2**20):
+        # Neighbours of every row, computed in blocks of rows so the memory
+        # held at once stays below max_block_bytes: per score 4 bytes, 4 more
+        # for the negated copy and 8 for the argpartition indices.
+        n = len(self)
+        chunk_size = max(1, min(n, max_block_bytes // (16 * max(1, n))))
+        k = min(k, n - 1)
+
+        all_idx = np.empty((n, k), dtype=np.int32)
+        all_scores = np.empty((n, k), dtype=np.float32)
+
+        for start in range(0, n, chunk_size):
+            ids = np.arange(start, min(n, start + chunk_size))
+            idx, scores = self.query_ids(ids, k=k)
+            all_idx[ids] = idx
+            all_scores[ids] = scores
+
+        return all_idx, all_scores
+
+
+class MappedSimilarityIndex(SimilarityIndex):
+    # Exact cosine similarity over a read-only (memory-mapped) embedding
+    # matrix. Only the row norms are kept in memory, the rows themselves are
+    # paged in by the OS and shared between processes mapping the same file.
+
+    def __init__(self, embeddings, chunk_size=65536):
+        self.vectors = embeddings
+        self.norms = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), chunk_size):
+            chunk = np.asarray(embeddings[start:start + chunk_size], dtype=np.float32)
+            self.norms[start:start + chunk_size] = np.linalg.norm(chunk, axis=1)
+        self.norms[self.norms == 0] = 1.0
+
+
+    def scores(self, queries):
+        return (queries @ self.vectors.T) / self.norms
+
+
+class IVFIndex(SimilarityIndex):
+    # Approximate index for large graphs: the normalized vectors are clustered
+    # with k-means, a query only scores the members of its n_probe closest
+    # clusters.
+
+    def __init__(self, embeddings, n_lists=None, n_probe=8, seed=42):
+        from sklearn.cluster import MiniBatchKMeans
+
+        super().__init__(embeddings)
+        n = len(self.vectors)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = min(n_probe, self.n_lists)
+
+        kmeans = MiniBatchKMeans(n_clusters=self.n_lists, random_state=seed, n_init=3, batch_size=4096)
+        assignments = kmeans.fit_predict(self.vectors)
+        self.centroids = normalize_rows(kmeans.cluster_centers_)
+
+        # Inverted lists stored CSR-style: members of list c are
+        # order[offsets[c]:offsets[c + 1]].
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))])
+
+
+    def query(self, vectors, k=10, exclude=None):
+        single = np.ndim(vectors) == 1
+        queries = normalize_rows(np.atleast_2d(vectors))
+        excluded = np.full(len(queries), -1) if exclude is None else np.atleast_1d(exclude)
+
+        probes, _ = top_k_rows(queries @ self.centroids.T, self.n_probe)
+
+        all_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        all_top = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        for q, query in enumerate(queries):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes[q]])
+            candidates = candidates[candidates != excluded[q]]
+            scores = self.vectors[candidates] @ query
+
+            idx, top = top_k_rows(scores[None, :], k)
+            all_idx[q, :idx.shape[1]] = candidates[idx[0]]
+            all_top[q, :top.shape[1]] = top[0]
+
+        return (all_idx[0], all_top[0]) if single else (all_idx, all_top)
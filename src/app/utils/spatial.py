@@ -0,0 +1,75 @@
+import numpy as np
+
+from scipy.spatial import cKDTree
+
+from utils.layout import relax_overlaps
+
+
+class SpatialIndex:
+    # KD-tree over the star positions, for neighbourhood queries and for
+    # spreading out stars that sit on top of each other.
+
+    def __init__(self, positions):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.tree = cKDTree(self.positions)
+
+
+    def __len__(self):
+        return len(self.positions)
+
+
+    def relax(self, min_distance, iterations=10, step=0.5):
+        # Iterative minimum-separation relaxation, the tree is rebuilt on the
+        # moved positions.
+        self.positions = relax_overlaps(self.positions, min_distance, iterations=iterations, step=step)
+        self.tree = cKDTree(self.positions)
+        return self.positions
+
+
+    def nearest(self, points, k=1):
+        # Ids and distances of the k nearest stars of every query point.
+        k = min(k, len(self))
+        distances, ids = self.tree.query(np.atleast_2d(points), k=k)
+        ids = np.asarray(ids).reshape(-1, k)
+        distances = np.asarray(distances).reshape(-1, k)
+        return (ids[0], distances[0]) if np.ndim(points) == 1 else (ids, distances)
+
+
+    def within(self, point, radius):
+        # Ids of the stars within radius of point, closest first.
+        ids = np.asarray(self.tree.query_ball_point(point, radius), dtype=np.int64)
+        distances = np.linalg.norm(self.positions[ids] - point, axis=1)
+        return ids[np.argsort(distances, kind="stable")]
+
+
+    def overlapping_pairs(self, min_distance):
+        return self.tree.query_pairs(min_distance, output_type="ndarray")
+
+
+    def export_grid(self, cell_size=None, points_per_cell=4):
+        # Uniform grid over the bounding box for the web client. Only
+        # non-empty cells are listed: cell cells[c] (linear id
+        # x + dims[0] * (y + dims[1] * z)) holds ids[offsets[c]:offsets[c + 1]].
+        lower = self.positions.min(axis=0)
+        extent = np.maximum(self.positions.max(axis=0) - lower, 1e-9)
+
+        if cell_size is None:
+            # About points_per_cell stars per cell for an even spread.
+            cell_size = float(np.cbrt(np.prod(extent) * points_per_cell / max(1, len(self))))
+            cell_size = max(cell_size, float(extent.max()) / 1024)
+
+        dims = np.floor(extent / cell_size).astype(np.int64) + 1
+        coords = np.minimum(((self.positions - lower) / cell_size).astype(np.int64), dims - 1)
+        linear = coords[:, 0] + dims[0] * (coords[:, 1] + dims[1] * coords[:, 2])
+
+        order = np.argsort(linear, kind="stable")
+        cells, counts = np.unique(linear[order], return_counts=True)
+
+        return {
+            "origin": lower.tolist(),
+            "cell_size": cell_size,
+            "dims": dims.tolist(),
+            "cells": cells.tolist(),
+            "offsets": np.concatenate([[0], np.cumsum(counts)]).tolist(),
+            "ids": order.tolist(),
+        }
@@ -0,0 +1,184 @@
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Node2VecWalker:
+    # Second-order (p, q) biased random walks over a CSR adjacency matrix.
+    # All walkers of a batch advance together. The next node is drawn from the
+    # edge weights and accepted with probability alpha(prev, next) / max(alpha)
+    # (rejection sampling), so no per-edge transition tables are built.
+
+    def __init__(self, indptr, indices, weights, p=1.0, q=1.0):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.n = len(self.indptr) - 1
+        self.degrees = np.diff(self.indptr)
+
+        weights = np.asarray(weights, dtype=np.float64)
+        self.cum_weights = np.cumsum(weights)
+        starts = np.concatenate([[0.0], self.cum_weights])
+        self.row_base = starts[self.indptr[:-1]]
+        self.row_sum = starts[self.indptr[1:]] - self.row_base
+
+        # Sorted (row, col) keys, used to test whether two nodes are linked.
+        rows = np.repeat(np.arange(self.n, dtype=np.int64), self.degrees)
+        self.edge_keys = rows * self.n + self.indices
+
+        self.alpha_return = 1.0 / p
+        self.alpha_out = 1.0 / q
+        self.alpha_max = max(self.alpha_return, 1.0, self.alpha_out)
+
+
+    @classmethod
+    def from_csr(cls, adjacency, p=1.0, q=1.0):
+        return cls(adjacency.indptr, adjacency.indices, adjacency.data, p=p, q=q)
+
+
+    def _sample_neighbours(self, nodes, rng):
+        target = self.row_base[nodes] + rng.random(len(nodes)) * self.row_sum[nodes]
+        pos = np.searchsorted(self.cum_weights, target, side="right")
+        pos = np.clip(pos, self.indptr[nodes], self.indptr[nodes + 1] - 1)
+        return self.indices[pos]
+
+
+    def _is_edge(self, a, b):
+        keys = a.astype(np.int64) * self.n + b
+        pos = np.minimum(np.searchsorted(self.edge_keys, keys), len(self.edge_keys) - 1)
+        return self.edge_keys[pos] == keys
+
+
+    def walks(self, start_nodes, walk_length, rng):
+        # One walk per start node, shape (len(start_nodes), walk_length). Walks
+        # that reach a node without neighbours are padded with -1.
+        start_nodes = np.asarray(start_nodes, dtype=np.int32)
+        walks = np.full((len(start_nodes), walk_length), -1, dtype=np.int32)
+        walks[:, 0] = start_nodes
+
+        if walk_length < 2 or len(self.edge_keys) == 0:
+            return walks
+
+        alive = np.flatnonzero(self.degrees[start_nodes] > 0)
+        walks[alive, 1] = self._sample_neighbours(start_nodes[alive], rng)
+
+        for t in range(2, walk_length):
+            pending = np.flatnonzero(walks[:, t - 1] >= 0)
+            pending = pending[self.degrees[walks[pending, t - 1]] > 0]
+
+            while len(pending):
+                cur = walks[pending, t - 1]
+                prev = walks[pending, t - 2]
+                candidates = self._sample_neighbours(cur, rng)
+
+                alpha = np.where(self._is_edge(prev, candidates), 1.0, self.alpha_out)
+                alpha[candidates == prev] = self.alpha_return
+
+                accept = rng.random(len(pending)) * self.alpha_max < alpha
+                walks[pending[accept], t] = candidates[accept]
+                pending = pending[~accept]
+
+        return walks
+
+
+_worker_walker = None
+
+
+def _init_worker(indptr, indices, weights, p, q):
+    global _worker_walker
+    _worker_walker = Node2VecWalker(indptr, indices, weights, p=p, q=q)
+
+
+def _walk_batch(start_nodes, walk_length, seed):
+    return _worker_walker.walks(start_nodes, walk_length, np.random.default_rng(seed))
+
+
+def generate_walks(
+    adjacency,
+    num_walks=200,
+    walk_length=30,
+    p=1.0,
+    q=1.0,
+    workers=None,
+    batch_size=4096,
+    seed=42,
+    start_nodes=None
+    ):
+    # Yields batches of walks (int32 arrays) in a deterministic order. Every
+    # round starts one walk from each start node (all nodes by default), in a
+    # shuffled order. Batches are computed by a process pool, at most
+    # 2 * workers batches are in flight.
+    workers = workers or os.cpu_count() or 1
+    if start_nodes is None:
+        start_nodes = np.arange(adjacency.shape[0], dtype=np.int32)
+    start_nodes = np.asarray(start_nodes, dtype=np.int32)
+    n = len(start_nodes)
+
+    def walk_tasks():
+        rng = np.random.default_rng(seed)
+        for _ in range(num_walks):
+            order = start_nodes[rng.permutation(n)]
+            for start in range(0, n, batch_size):
+                yield order[start:start + batch_size], int(rng.integers(2**63))
+
+    tasks = walk_tasks()
+
+    if workers == 1:
+        _init_worker(adjacency.indptr, adjacency.indices, adjacency.data, p, q)
+        for batch_nodes, batch_seed in tasks:
+            yield _walk_batch(batch_nodes, walk_length, batch_seed)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(adjacency.indptr, adjacency.indices, adjacency.data, p, q)
+    ) as executor:
+        in_flight = []
+        for batch_nodes, batch_seed in tasks:
+            in_flight.append(executor.submit(_walk_batch, batch_nodes, walk_length, batch_seed))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.pop(0).result()
+        for future in in_flight:
+            yield future.result()
+
+
+class WalkSentences:
+    # Re-iterable view of a walk matrix for gensim: every walk becomes a list
+    # of tokens (tokens[node] for each node id), padding is dropped.
+
+    def __init__(self, walks, tokens, batch_size=4096):
+        self.walks = walks
+        self.batch_size = batch_size
+        self.tokens = tokens
+
+
+    def __iter__(self):
+        for start in range(0, len(self.walks), self.batch_size):
+            for walk in self.walks[start:start + self.batch_size]:
+                if walk[-1] < 0:
+                    walk = walk[walk >= 0]
+                yield self.tokens[walk].tolist()
+
+
+def write_walk_corpus(batches, corpus_file, tokens):
+    # Streams walk batches to disk in gensim's LineSentence format (one walk
+    # per line, node ids separated by spaces), so only the batches in flight
+    # are ever held in memory. Word2Vec(corpus_file=...) then reads the file
+    # once per epoch with all its workers.
+    tmp_file = f"{corpus_file}.tmp"
+    n_walks = 0
+
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for batch in batches:
+            lines = []
+            for walk in batch:
+                if walk[-1] < 0:
+                    walk = walk[walk >= 0]
+                lines.append(" ".join(tokens[walk].tolist()))
+            f.write("\n".join(lines))
+            f.write("\n")
+            n_walks += len(batch)
+
+    os.replace(tmp_file, corpus_file)
+    return n_walks
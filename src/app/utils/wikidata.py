@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import tqdm
+
+import requests
+
+from utils.ratelimit import RateLimiter
+
+
+MBID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+
+def empty_links():
+    return {
+        "spotify": None,
+        "youtube": None,
+        "apple_music": None
+    }
+
+
+class WikidataLinks:
+    # Resolves MusicBrainz artist ids to streaming links with one SPARQL query
+    # per batch of MBIDs. Results are kept in a JSON cache, so reruns only
+    # query MBIDs that have not been seen before.
+
+    URL = "https://query.wikidata.org/sparql"
+
+    PLATFORMS = {
+        "spotifyId": ("spotify", "https://open.spotify.com/artist/{}"),
+        "youtubeId": ("youtube", "https://www.youtube.com/channel/{}"),
+        "appleMusicId": ("apple_music", "https://music.apple.com/artist/{}"),
+    }
+
+
+    def __init__(self, http, cache_file, batch_size=200, rate_limit=1.0):
+        self.http = http
+        self.cache_file = cache_file
+        self.batch_size = batch_size
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.cache = {}
+
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                self.cache = json.load(f)
+
+
+    def _save(self):
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+
+    def _build_query(self, mbids):
+        values = " ".join(f'"{mbid}"' for mbid in mbids)
+        return f"""
+        SELECT ?mbid ?spotifyId ?youtubeId ?appleMusicId WHERE {{
+        VALUES ?mbid {{ {values} }}
+        ?artist wdt:P434 ?mbid .
+        OPTIONAL {{ ?artist wdt:P1902 ?spotifyId . }}
+        OPTIONAL {{ ?artist wdt:P2397 ?youtubeId . }}
+        OPTIONAL {{ ?artist wdt:P2850 ?appleMusicId . }}
+        }}
+        """
+
+
+    def _query(self, mbids):
+        headers = {
+            "Accept": "application/sparql-results+json",
+            "User-Agent": "MilkywayOfMusic/1.0 (https://github.com/falberts/Milkyway-of-Music)"
+        }
+
+        try:
+            response = self.http.post(
+                self.URL,
+                data={"query": self._build_query(mbids)},
+                headers=headers,
+                timeout=60,
+                rate_limiter=self.rate_limiter,
+                endpoint="wikidata.sparql"
+            )
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Wikidata query failed for a batch of {len(mbids)} MBIDs: {e}")
+            return None
+
+        results = {mbid: empty_links() for mbid in mbids}
+
+        for b in data.get("results", {}).get("bindings", []):
+            mbid = b.get("mbid", {}).get("value", "").lower()
+            if mbid not in results:
+                continue
+            for key, (platform, url) in self.PLATFORMS.items():
+                if key in b and not results[mbid][platform]:
+                    results[mbid][platform] = url.format(b[key]["value"])
+
+        return results
+
+
+    def resolve(self, mbids):
+        mbids = {mbid.lower() for mbid in mbids if mbid}
+        valid = sorted(mbid for mbid in mbids if MBID_PATTERN.match(mbid))
+        missing = [mbid for mbid in valid if mbid not in self.cache]
+
+        if missing:
+            print(f"Resolving links for {len(missing)} MBIDs ({len(valid) - len(missing)} cached)...")
+            for i in tqdm.tqdm(range(0, len(missing), self.batch_size)):
+                results = self._query(missing[i:i + self.batch_size])
+                if results is None:
+                    continue
+                self.cache.update(results)
+                self._save()
+
+        return {mbid: dict(self.cache.get(mbid, empty_links())) for mbid in mbids}
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from lastfm_stub import start_stub_server
+from utils.lastfm import LastFM
+
+
+class CrawlOnly(LastFM):
+    # Only the similar artists crawl is measured here, enrichment is skipped.
+    def create_dict_file(self):
+        pass
+
+
+def crawl(base_url, workers, rate_limit, top_limit, depth):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        CrawlOnly(
+            api_key="stub",
+            top_limit=top_limit,
+            depth=depth,
+            cache_dir=cache_dir,
+            workers=workers,
+            rate_limit=rate_limit,
+            base_url=base_url
+            )
+        elapsed = time.perf_counter() - start
+        n_files = len(os.listdir(Path(cache_dir) / "similar_artists"))
+    return elapsed, n_files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the similar artists crawl against a stub API.")
+    parser.add_argument("--top-limit", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    for workers in args.workers:
+        elapsed, n_files = crawl(url, workers, args.rate_limit, args.top_limit, args.depth)
+        print(f"workers={workers:>3}  artists={n_files:>6}  time={elapsed:.2f}s")
+    server.shutdown()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import matplotlib
+matplotlib.use("Agg")
+
+from synthetic import write_synthetic_cache
+from utils.graph import Graph
+from utils.galaxy import GalaxyGraph
+from utils.instrument import PeakRSS
+
+
+def run_stage(results, name, func, items=None):
+    with PeakRSS() as memory:
+        start = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - start
+
+    results[name] = {
+        "seconds": round(elapsed, 4),
+        "peak_rss_mb": round(memory.peak / 2**20, 1),
+    }
+    if items:
+        results[name]["items_per_second"] = round(items / elapsed, 1) if elapsed > 0 else None
+    print(f"  {name:<10} {elapsed:>9.2f}s  {memory.peak / 2**20:>8.1f} MB")
+    return value
+
+
+def bench_size(n_artists, num_walks, walk_length, workers, queries):
+    stages = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f"{n_artists} artists:")
+        run_stage(stages, "generate", lambda: write_synthetic_cache(cache_dir, n_artists), n_artists)
+
+        graph = Graph(cache_dir, regen=True, build=False)
+        run_stage(stages, "load", graph.load_dict_file, n_artists)
+        csr = run_stage(stages, "graph", graph.build_graph, n_artists)
+
+        galaxy = GalaxyGraph(graph, regen=True, build=False)
+        n = csr.number_of_nodes()
+        run_stage(
+            stages,
+            "embed",
+            lambda: galaxy.compute_node2vec_embeddings(num_walks=num_walks, walk_length=walk_length, workers=workers),
+            n * num_walks
+        )
+        run_stage(stages, "reduce", galaxy.reduce_embeddings_3d, n)
+        run_stage(stages, "layout", galaxy.spiral_warp, n)
+        run_stage(stages, "similar", lambda: galaxy.top_k_similar(galaxy.nodes[:queries], k=10), min(n, queries))
+        run_stage(stages, "export", lambda: galaxy.export_to_json(sharded=True, neighbours=False), n)
+        run_stage(stages, "neighbours", galaxy.export_neighbours, n)
+        run_stage(stages, "hybrid", galaxy.export_hybrid_neighbours, n)
+
+        return {
+            "n_artists": n_artists,
+            "nodes": n,
+            "edges": csr.number_of_edges(),
+            "stages": stages,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic artist graphs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--num-walks", type=int, default=10, help="Walks per node (the pipeline default is 200).")
+    parser.add_argument("--walk-length", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queries", type=int, default=1000, help="Artists queried in the similar stage.")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {
+            "num_walks": args.num_walks,
+            "walk_length": args.walk_length,
+            "workers": args.workers,
+            "queries": args.queries,
+        },
+        "runs": [],
+    }
+
+    for size in args.sizes:
+        report["runs"].append(bench_size(size, args.num_walks, args.walk_length, args.workers, args.queries))
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Results written to {args.out}.")
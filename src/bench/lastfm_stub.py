@@ -0,0 +1,89 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Minimal stand-in for the Last.fm API, used to benchmark the crawler and the
+# enrichment stages without touching the real service. Responses are derived
+# from a hash of the artist name, so every run sees the same graph.
+
+def _pick(name, i, n_artists):
+    digest = hashlib.md5(f"{name}:{i}".encode("utf-8")).hexdigest()
+    return f"Artist {int(digest[:8], 16) % n_artists}"
+
+
+def _match(name, i):
+    digest = hashlib.md5(f"{name}#{i}".encode("utf-8")).hexdigest()
+    return f"{int(digest[:4], 16) / 0xffff:.6f}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    n_artists = 100_000
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def _send(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        method = params.get("method")
+        name = params.get("artist", "")
+        limit = int(params.get("limit", 5))
+
+        if method == "chart.gettopartists":
+            artists = [{"name": f"Artist {i}"} for i in range(limit)]
+            self._send({"artists": {"artist": artists}})
+        elif method == "artist.getsimilar":
+            artists = [
+                {"name": _pick(name, i, self.n_artists), "match": _match(name, i)}
+                for i in range(limit)
+            ]
+            self._send({"similarartists": {"artist": artists}})
+        elif method == "artist.getinfo":
+            self._send({"artist": {"name": name, "mbid": "", "bio": {"summary": f"Bio of {name}."}}})
+        elif method == "artist.gettoptags":
+            tags = [{"name": f"tag{int(_match(name, i)[2:4]) % 40}", "count": 100 - i * 10} for i in range(5)]
+            self._send({"toptags": {"tag": tags}})
+        else:
+            self._send({"error": 3, "message": "Invalid Method"}, status=400)
+
+
+def start_stub_server(port=0, latency=0.05, n_artists=100_000):
+    handler = type("Handler", (StubHandler,), {"latency": latency, "n_artists": n_artists})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/2.0/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Last.fm API for benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated latency per request.")
+    parser.add_argument("--artists", type=int, default=100_000, help="Number of distinct fake artists.")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.artists)
+    print(f"Stub Last.fm API listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import numpy as np
+
+from pathlib import Path
+
+
+# Synthetic stand-in for the crawled data: writes an artists_tags.json (and
+# all_tags.json) in the format LastFM.create_dict_file() produces, at any
+# size. Artists belong to genres of Zipf-distributed sizes. Similar artists
+# are mostly drawn from the same genre, weighted by a power-law popularity,
+# so degrees follow a power law and the graph has clusters.
+
+WORDS = (
+    "band album tour songs released debut record label sound guitar vocals "
+    "drummer founded members formed single chart studio live music style "
+    "influenced genre scene city known career years first second new"
+).split()
+
+
+def empty_links():
+    return {
+        "spotify": None,
+        "youtube": None,
+        "apple_music": None
+    }
+
+
+def generate_artists_tags(
+    n_artists,
+    similar_limit=5,
+    n_genres=None,
+    n_tags=1000,
+    alpha=1.1,
+    in_genre=0.8,
+    bio_words=60,
+    seed=42
+    ):
+    rng = np.random.default_rng(seed)
+    n = n_artists
+    n_genres = n_genres or max(1, int(np.sqrt(n) / 2))
+
+    names = [f"Synthetic Artist {i}" for i in range(n)]
+    popularity = np.arange(1, n + 1, dtype=np.float64) ** -alpha
+    rng.shuffle(popularity)
+
+    genre_sizes = np.arange(1, n_genres + 1, dtype=np.float64) ** -1.0
+    genres = rng.choice(n_genres, size=n, p=genre_sizes / genre_sizes.sum())
+
+    # Similar artists: in_genre of the picks come from the own genre, the rest
+    # from all artists, both weighted by popularity.
+    similar = rng.choice(n, size=(n, similar_limit), p=popularity / popularity.sum())
+    local = rng.random((n, similar_limit)) < in_genre
+    by_genre = np.argsort(genres, kind="stable")
+    for members in np.split(by_genre, np.cumsum(np.bincount(genres, minlength=n_genres))[:-1]):
+        if len(members) == 0:
+            continue
+        weights = popularity[members] / popularity[members].sum()
+        picks = rng.choice(members, size=(len(members), similar_limit), p=weights)
+        similar[members] = np.where(local[members], picks, similar[members])
+
+    matches = -np.sort(-rng.random((n, similar_limit)), axis=1)
+
+    # Tags: three core tags of the genre and two from a Zipf distribution
+    # over all tags, with Last.fm style weights.
+    tag_popularity = np.arange(1, n_tags + 1, dtype=np.float64) ** -alpha
+    genre_tags = rng.choice(n_tags, size=(n_genres, 3), p=tag_popularity / tag_popularity.sum())
+    extra_tags = rng.choice(n_tags, size=(n, 2), p=tag_popularity / tag_popularity.sum())
+    artist_tags = np.concatenate([genre_tags[genres], extra_tags], axis=1)
+    tag_weights = [100, 90, 80, 70, 60]
+
+    bio_lengths = np.maximum(1, rng.lognormal(np.log(bio_words), 0.6, size=n).astype(np.int64))
+
+    artists = {}
+    all_tags = {}
+    for i, name in enumerate(names):
+        similar_artists = {}
+        for j, match in zip(similar[i], matches[i]):
+            if j != i:
+                similar_artists[names[j]] = round(float(match), 6)
+
+        tags = {}
+        for tag, weight in zip(artist_tags[i], tag_weights):
+            tags.setdefault(f"tag{tag}", weight)
+        for tag, weight in tags.items():
+            all_tags[tag] = all_tags.get(tag, 0) + weight
+
+        artists[name] = {
+            "similar_artists": similar_artists,
+            "tags": tags,
+            "bio": " ".join(rng.choice(WORDS, size=bio_lengths[i])).capitalize() + ".",
+            "links": empty_links()
+        }
+
+    return artists, all_tags
+
+
+def write_synthetic_cache(cache_dir, n_artists, **kwargs):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    artists, all_tags = generate_artists_tags(n_artists, **kwargs)
+
+    with open(cache_dir / "artists_tags.json", "w", encoding="utf-8") as f:
+        json.dump(artists, f, ensure_ascii=False, indent=2)
+
+    with open(cache_dir / "all_tags.json", "w", encoding="utf-8") as f:
+        json.dump(all_tags, f, indent=2)
+
+    return os.path.getsize(cache_dir / "artists_tags.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic artists_tags.json for benchmarks.")
+    parser.add_argument("n_artists", type=int)
+    parser.add_argument("--out", default="data/bench", help="Cache directory to write to.")
+    parser.add_argument("--similar-limit", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    size = write_synthetic_cache(args.out, args.n_artists, similar_limit=args.similar_limit, seed=args.seed)
+    print(f"Wrote {args.n_artists} artists ({size / 2**20:.1f} MB) to {args.out}.")
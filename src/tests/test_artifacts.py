@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.artifacts import ArtifactManifest
+
+
+class ArtifactManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.input = self.root / "input.json"
+        self.output = self.root / "out" / "output.bin"
+        self.output.parent.mkdir()
+        self.write(self.input, "input")
+        self.write(self.output, "output")
+        self.params = {"alpha": 0.7}
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+    def manifest(self):
+        return ArtifactManifest(self.root / "pipeline.json", root=self.root)
+
+
+    def is_fresh(self, manifest=None, params=None, outputs=None):
+        return (manifest or self.manifest()).is_fresh(
+            "stage", [self.input], params or self.params, outputs or [self.output]
+        )
+
+
+    def test_fresh_until_something_changes(self):
+        self.assertFalse(self.is_fresh())
+        self.manifest().record("stage", [self.input], self.params, [self.output])
+
+        self.assertTrue(self.is_fresh())
+        # Same contents, new modification time.
+        self.write(self.input, "input")
+        self.assertTrue(self.is_fresh())
+
+        self.assertFalse(self.is_fresh(params={"alpha": 0.5}))
+
+        self.write(self.output, "changed output")
+        self.assertFalse(self.is_fresh())
+        self.write(self.output, "output")
+        self.assertTrue(self.is_fresh())
+
+        self.output.unlink()
+        self.assertFalse(self.is_fresh())
+        self.write(self.output, "output")
+
+        self.write(self.input, "changed input")
+        self.assertFalse(self.is_fresh())
+
+
+    def test_directory_outputs(self):
+        self.manifest().record("stage", [self.input], self.params, [self.output.parent])
+        self.assertTrue(self.is_fresh(outputs=[self.output.parent]))
+
+        self.write(self.output.parent / "extra.json", "{}")
+        self.assertFalse(self.is_fresh(outputs=[self.output.parent]))
+        (self.output.parent / "extra.json").unlink()
+        self.assertTrue(self.is_fresh(outputs=[self.output.parent]))
+
+        self.output.unlink()
+        self.assertFalse(self.is_fresh(outputs=[self.output.parent]))
+
+
+    def test_npz_hash_ignores_zip_metadata(self):
+        # Same arrays saved at different times (some numpy versions store
+        # the time in the zip headers) and with or without compression.
+        arrays = {"center": np.arange(3, dtype=np.float32), "components": np.eye(3)}
+
+        def save(path, date_time, compression=zipfile.ZIP_STORED, values=arrays):
+            with zipfile.ZipFile(path, "w", compression=compression) as archive:
+                for name, array in values.items():
+                    data = io.BytesIO()
+                    np.save(data, array)
+                    archive.writestr(zipfile.ZipInfo(f"{name}.npy", date_time=date_time), data.getvalue())
+
+        first, second, other = self.root / "first.npz", self.root / "second.npz", self.root / "other.npz"
+        np.savez(first, **arrays)
+        save(second, (2024, 5, 17, 12, 30, 0), compression=zipfile.ZIP_DEFLATED)
+        save(other, (1980, 1, 1, 0, 0, 0), values={**arrays, "center": np.zeros(3, dtype=np.float32)})
+
+        manifest = self.manifest()
+        self.assertNotEqual(first.read_bytes(), second.read_bytes())
+        self.assertEqual(manifest.file_hash(second), manifest.file_hash(first))
+        self.assertNotEqual(manifest.file_hash(other), manifest.file_hash(first))
+
+
+    def test_hashes_are_cached_by_size_and_mtime(self):
+        manifest = self.manifest()
+        first = manifest.file_hash(self.input)
+        manifest.save()
+
+        manifest = self.manifest()
+        with mock.patch("builtins.open", side_effect=AssertionError("file was read")):
+            self.assertEqual(manifest.file_hash(self.input), first)
+
+        # Same size, new modification time: read again.
+        stat = os.stat(self.input)
+        self.write(self.input, "INPUT")
+        os.utime(self.input, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertNotEqual(manifest.file_hash(self.input), first)
+
+        with open(self.root / "pipeline.json", "r", encoding="utf-8") as f:
+            self.assertIn("input.json", json.load(f)["files"])
+
+
+    def test_missing_and_invalid_manifest(self):
+        self.assertIsNone(self.manifest().file_hash(self.root / "missing.json"))
+        self.write(self.root / "pipeline.json", "{not json")
+        self.assertFalse(self.is_fresh())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.artists import ArtistsFile
+
+
+ARTISTS = {
+    "Radiohead": {
+        "similar_artists": {"Thom Yorke": 1.0},
+        "tags": {"alternative": 100},
+        "bio": "Quotes \"like {this}\", braces } { and a backslash \\ in the bio.",
+        "links": {},
+    },
+    "Björk": {
+        "similar_artists": {"Sigur Rós": 0.8, "Múm": 0.5},
+        "tags": {"électronique": 80},
+        "bio": "Ísland, 日本語 and emoji 🎵.",
+        "links": {"wikipedia": "https://en.wikipedia.org/wiki/Bj%C3%B6rk"},
+    },
+    "Sigur Rós": {"similar_artists": {}, "tags": {}, "bio": None, "links": {}},
+    "AC/DC \"Live\" {}": {
+        "similar_artists": {"Björk": 0.1},
+        "tags": {"rock": 50},
+        "bio": "}, \"Radiohead\": {",
+        "links": {},
+    },
+}
+
+
+class ArtistsFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "artists_tags.json"
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, **dump_kwargs):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(ARTISTS, f, **dump_kwargs)
+
+
+    def check_details(self, artists_file):
+        try:
+            for name, entry in ARTISTS.items():
+                self.assertEqual(artists_file.details(name), entry)
+            self.assertIsNone(artists_file.details("Unknown"))
+        finally:
+            artists_file.close()
+
+
+    def test_entries_and_details(self):
+        # Indented and compact, escaped and raw non-ASCII, and chunks that
+        # split entries and multi-byte characters.
+        for dump_kwargs in [{"indent": 2}, {"ensure_ascii": False}, {"ensure_ascii": False, "indent": 2}]:
+            for chunk_size in [7, 64, 2**20]:
+                with self.subTest(chunk_size=chunk_size, **dump_kwargs):
+                    self.write(**dump_kwargs)
+                    artists_file = ArtistsFile(self.path, chunk_size=chunk_size)
+                    self.assertEqual(list(artists_file.iter_entries()), list(ARTISTS.items()))
+                    self.assertEqual(len(artists_file), len(ARTISTS))
+                    self.check_details(artists_file)
+
+
+    def test_saved_index(self):
+        self.write(ensure_ascii=False, indent=2)
+        index_file = Path(self.tmp.name) / "artists_index.json"
+        artists_file = ArtistsFile(self.path)
+        artists_file.build_index()
+        artists_file.save_index(index_file)
+
+        loaded = ArtistsFile(self.path)
+        self.assertTrue(loaded.load_index(index_file))
+        self.assertEqual(loaded.offsets, artists_file.offsets)
+        self.check_details(loaded)
+
+        # Out of date once the file changes.
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertFalse(ArtistsFile(self.path).load_index(index_file))
+        self.assertFalse(ArtistsFile(self.path).load_index(Path(self.tmp.name) / "missing.json"))
+
+
+    def test_truncated_file(self):
+        self.write(indent=2)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 20)
+        with self.assertRaises(ValueError):
+            list(ArtistsFile(self.path, chunk_size=64).iter_entries())
+
+
+if __name__ == "__main__":
+    unittest.main()
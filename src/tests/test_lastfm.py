@@ -0,0 +1,95 @@
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.checkpoint import EnrichmentStore
+from utils.lastfm import LastFM, LastFMError
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+
+    def json(self):
+        if self.data is None:
+            raise ValueError("No JSON")
+        return self.data
+
+
+class FakeHTTP:
+    # Answers every request with the next entry of responses, exceptions are
+    # raised.
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+
+    def get(self, url, params=None, **kwargs):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+INFO = {"artist": {"bio": {"summary": "A band."}, "mbid": "ABC"}}
+
+
+class EnrichmentFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lastfm = LastFM(api_key="test", cache_dir=self.tmp.name, stages=())
+        self.lastfm.source_hashes = {"Radiohead": "hash"}
+        self.lastfm.store = EnrichmentStore(Path(self.tmp.name) / "enrichment.sqlite")
+
+
+    def tearDown(self):
+        self.lastfm.store.close()
+        self.tmp.cleanup()
+
+
+    def enrich(self, *responses):
+        self.lastfm.http = FakeHTTP(responses)
+        return self.lastfm.enrich_artists(stages=("info",))
+
+
+    def test_failed_request_stays_pending_and_is_retried(self):
+        for failure in [
+            requests.ConnectionError("Connection refused"),
+            FakeResponse(503, None),
+            FakeResponse(429, {"error": 29, "message": "Rate limit exceeded"}),
+            FakeResponse(200, None),
+            FakeResponse(200, {"error": 16, "message": "Temporary error"}),
+        ]:
+            self.assertEqual(self.enrich(failure), 1)
+            self.assertEqual(self.lastfm.store.pending("info", self.lastfm.source_hashes), ["Radiohead"])
+
+        self.assertEqual(self.enrich(FakeResponse(200, INFO)), 0)
+        self.assertEqual(self.lastfm.store.pending("info", self.lastfm.source_hashes), [])
+        self.assertEqual(self.lastfm.store.get_stage("info")["Radiohead"], {"bio": "A band.", "mbid": "abc"})
+
+
+    def test_error_payload_is_stored_as_empty(self):
+        # An unknown artist is an answer, asking again would not change it.
+        self.assertEqual(self.enrich(FakeResponse(200, {"error": 6, "message": "The artist could not be found"})), 0)
+        self.assertEqual(self.lastfm.store.get_stage("info")["Radiohead"], {"bio": None, "mbid": None})
+
+
+    def test_crawl_requests_are_not_strict(self):
+        self.lastfm.http = FakeHTTP([requests.Timeout("Timed out")])
+        self.assertEqual(self.lastfm._request({"method": "artist.getsimilar"}), {})
+
+        self.lastfm.http = FakeHTTP([requests.Timeout("Timed out")])
+        with self.assertRaises(LastFMError):
+            self.lastfm._request({"method": "artist.getinfo"}, strict=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
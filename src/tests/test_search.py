@@ -0,0 +1,97 @@
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.search import MAX_FUZZY_CANDIDATES, SearchIndex
+
+
+SEARCH_JS = Path(__file__).resolve().parents[2] / "docs" / "scripts" / "search.js"
+
+NAMES = [
+    "The Beatles", "Beyoncé", "Sigur Rós", "Björk", "Mötley Crüe", "Led Zeppelin", "AC/DC", "Guns N' Roses",
+    "Ｔｏｒｏ ｙ Ｍｏｉ", "Café Tacvba", "The The", "Hüsker Dü", "Straße", "MØ", "m83", "Stars ★ Band", "🎵 Emoji Band",
+]
+
+QUERIES = [
+    "b", "be", "beat", "the", "the b", "the beatles", "beatles", "BJÖRK", "motley crue", "zepelin", "led zep",
+    "ac dc", "toro", "cafe tac", "husker du", "strasse", "m83", "stars band", "🎵", "rock star", "kalo",
+    "kalomi", "kalomira", "kaloimra", "ralosu te", "thst be", "an el or", "the the the", "xyzxyz",
+]
+
+
+def build_names(n=20000, seed=0):
+    # Few syllables, so common trigrams hold far more than
+    # MAX_FUZZY_CANDIDATES artists and the fuzzy bound is exercised.
+    rng = random.Random(seed)
+    syllables = "ka lo mi ra su te no vi th be st an el or".split()
+    return NAMES + [
+        " ".join("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))).capitalize() for _ in range(rng.randint(1, 3)))
+        for _ in range(n)
+    ]
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.names = build_names()
+        degrees = random.Random(1).choices(range(60), k=len(cls.names))
+        cls.index = SearchIndex.build(cls.names, degrees)
+
+
+    def test_short_query_limit(self):
+        # The prefix table holds at most limit hits, a higher limit gives those.
+        self.assertEqual(self.index.search("ka", limit=50), self.index.search("ka"))
+        self.assertEqual(len(self.index.search("ka", limit=50)), self.index.limit)
+        self.assertEqual(self.index.search("ka", limit=3), self.index.search("ka")[:3])
+
+
+    def test_common_trigrams_are_bounded(self):
+        self.assertGreater(max(len(ranks) for ranks in self.index.postings.values()), MAX_FUZZY_CANDIDATES)
+        self.assertEqual(self.index.search("the beatles")[0], "The Beatles")
+        self.assertEqual(self.index.search("zepelin")[0], "Led Zeppelin")
+
+
+    def test_round_trip(self):
+        loaded = SearchIndex.from_dict(self.names, json.loads(json.dumps(self.index.to_dict())))
+        for query in QUERIES:
+            self.assertEqual(loaded.search(query), self.index.search(query))
+
+
+    @unittest.skipIf(shutil.which("node") is None, "node is not installed")
+    def test_same_results_as_search_js(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = Path(tmp) / "data.json"
+            with open(data_file, "w", encoding="utf-8") as f:
+                json.dump({"names": self.names, "index": self.index.to_dict(), "queries": QUERIES}, f, ensure_ascii=False)
+
+            script = (
+                f"import {{ loadSearchIndex, searchArtists }} from {json.dumps(SEARCH_JS.as_uri())};\n"
+                "import fs from 'fs';\n"
+                "const data = JSON.parse(fs.readFileSync(process.argv.at(-1), 'utf8'));\n"
+                "const index = loadSearchIndex(data.index, data.names);\n"
+                "const results = {};\n"
+                "for (const query of data.queries) results[query] = [searchArtists(index, query), searchArtists(index, query, 50)];\n"
+                "process.stdout.write(JSON.stringify(results));\n"
+            )
+            output = subprocess.run(
+                ["node", "--input-type=module", "-", str(data_file)],
+                input=script, capture_output=True, text=True, encoding="utf-8", check=True
+            ).stdout
+
+        results = json.loads(output)
+        for query in QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(results[query], [self.index.search(query), self.index.search(query, limit=50)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import sys
+import tempfile
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from serve import GalaxyService, QueryError, start_server
+
+
+def write_galaxy(cache_dir, n=20):
+    # Smallest export GalaxyService can load: names, positions and embeddings.
+    rng = np.random.default_rng(0)
+    names = [f"Artist {i}" for i in range(n)]
+    galaxy_dir = Path(cache_dir) / "galaxy"
+    galaxy_dir.mkdir()
+
+    with open(galaxy_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"names": "names.json", "positions": "positions.bin"}, f)
+    with open(galaxy_dir / "names.json", "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    with open(Path(cache_dir) / "node2vec_nodes.json", "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    rng.random((n, 3), dtype=np.float32).astype("<f4").tofile(galaxy_dir / "positions.bin")
+    np.save(Path(cache_dir) / "node2vec_embeddings.npy", rng.standard_normal((n, 8)).astype(np.float32))
+
+
+class ServeErrorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        write_galaxy(cls.tmp.name)
+        cls.service = GalaxyService(cls.tmp.name)
+        cls.server, cls.url = start_server(cls.service, port=0)
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.tmp.cleanup()
+
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.url + path, timeout=10) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+
+    def errors(self, endpoint):
+        return self.service.metrics.summary().get(endpoint, {}).get("errors", 0)
+
+
+    def test_non_finite_coordinates_are_rejected(self):
+        for x in ["nan", "inf", "-inf", "1e999"]:
+            with self.assertRaises(QueryError):
+                self.service.nearest(x=x, y=0, z=0)
+
+            status, data = self.get(f"nearest?x={x}&y=0&z=0")
+            self.assertEqual(status, 400)
+            self.assertIn("finite", data["error"])
+
+        status, data = self.get("nearest?x=0.5&y=0.5&z=0.5&k=3")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(data["nearest"]), 3)
+
+
+    def test_unexpected_error_gives_500(self):
+        def fail(*args, **kwargs):
+            raise RuntimeError("Broken")
+
+        errors = self.errors("similar")
+        self.service.similar = fail
+        try:
+            status, data = self.get("similar?artist=Artist%201")
+        finally:
+            del self.service.similar
+
+        self.assertEqual(status, 500)
+        self.assertEqual(data, {"error": "Internal server error."})
+        # Recorded after the response is sent.
+        deadline = time.time() + 5
+        while self.errors("similar") == errors and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.errors("similar"), errors + 1)
+
+        status, data = self.get("similar?artist=Artist%201&k=2")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(data["similar"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import sys
+import unittest
+
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.similarity import SimilarityIndex
+from utils.tags import TagMatrix, hybrid_top_k
+
+
+def random_tags(n, rng):
+    # Every third artist has no tags, "solo" is held by a single artist.
+    vocabulary = ["rock", "pop", "jazz", "metal", "folk", "ambient"]
+    artist_tags = []
+    for i in range(n):
+        if i % 3 == 0:
+            artist_tags.append({})
+        else:
+            chosen = rng.choice(vocabulary, size=rng.integers(1, 4), replace=False)
+            artist_tags.append({str(tag): int(rng.integers(1, 101)) for tag in chosen})
+    artist_tags[1]["solo"] = 100
+    all_tags = {}
+    for tags in artist_tags:
+        for tag, weight in tags.items():
+            all_tags[tag] = all_tags.get(tag, 0) + weight
+    return artist_tags, all_tags
+
+
+class TagMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.artist_tags, self.all_tags = random_tags(60, rng)
+        self.tags = TagMatrix.build(self.artist_tags, self.all_tags)
+        self.similarity = SimilarityIndex(rng.standard_normal((60, 8)).astype(np.float32))
+
+
+    def test_rows_are_normalized(self):
+        norms = np.sqrt(np.asarray(self.tags.matrix.multiply(self.tags.matrix).sum(axis=1)).ravel())
+        has_tags = self.tags.has_tags()
+        np.testing.assert_allclose(norms[has_tags], 1.0, rtol=1e-5)
+        np.testing.assert_array_equal(norms[~has_tags], 0.0)
+        np.testing.assert_array_equal(has_tags, [bool(tags) for tags in self.artist_tags])
+
+
+    def test_vocabulary_pruning(self):
+        self.assertNotIn("solo", self.tags.tags)
+        self.assertIn("solo", TagMatrix.build(self.artist_tags, self.all_tags, min_artists=1).tags)
+
+        most_used = sorted(self.all_tags, key=lambda tag: -self.all_tags[tag])[:2]
+        self.assertEqual(set(TagMatrix.build(self.artist_tags, self.all_tags, max_tags=2).tags), set(most_used))
+
+        rare = min(self.all_tags, key=self.all_tags.get)
+        pruned = TagMatrix.build(self.artist_tags, self.all_tags, min_count=self.all_tags[rare] + 1)
+        self.assertNotIn(rare, pruned.tags)
+
+
+    def test_rows_without_tags_use_the_embeddings(self):
+        idx, scores = hybrid_top_k(self.similarity, self.tags, k=5, alpha=0.7)
+        expected_idx, expected_scores = self.similarity.all_top_k(k=5)
+
+        untagged = ~self.tags.has_tags()
+        np.testing.assert_array_equal(idx[untagged], expected_idx[untagged])
+        np.testing.assert_allclose(scores[untagged], expected_scores[untagged], rtol=1e-5)
+
+        # alpha=1 ignores the tags for every row.
+        idx, _ = hybrid_top_k(self.similarity, self.tags, k=5, alpha=1.0)
+        np.testing.assert_array_equal(idx, expected_idx)
+
+
+    def test_block_size_does_not_change_the_result(self):
+        idx, scores = hybrid_top_k(self.similarity, self.tags, k=5)
+        for max_block_bytes in [1, 20 * 60 * 7, 2**30]:
+            block_idx, block_scores = hybrid_top_k(self.similarity, self.tags, k=5, max_block_bytes=max_block_bytes)
+            np.testing.assert_array_equal(block_idx, idx)
+            np.testing.assert_allclose(block_scores, scores, rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()